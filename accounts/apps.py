@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from .bloom import add_user
+        from .instrumentation import install_query_recorder
+        from .models import User
+        from .user_cache import invalidate_user
+        connection_created.connect(install_query_recorder, dispatch_uid='accounts.instrumentation')
+        post_save.connect(invalidate_user, sender=User, dispatch_uid='accounts.user_cache.save')
+        post_delete.connect(invalidate_user, sender=User, dispatch_uid='accounts.user_cache.delete')
+        post_save.connect(add_user, sender=User, dispatch_uid='accounts.bloom')
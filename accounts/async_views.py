@@ -0,0 +1,267 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import login, logout
+from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.utils.decorators import method_decorator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from core.constants import ACCOUNT_REGISTER_SUCCESS, ACCOUNT_ACTIVATION_SUCCESS, ACCOUNT_ACTIVATION_FAILED, \
+    ACCOUNT_MODEL_BACKEND, ACCOUNT_LOGIN_SUCCESS, ACCOUNT_LOGOUT_SUCCESS, ACCOUNT_RESENT_ACTIVATION, \
+    ACCOUNT_PASSWORD_RESET_SUCCESS, ACCOUNT_PASSWORD_RESET_LINK_SENT, ACCOUNT_PASSWORD_RESET_INVALID_LINK, \
+    ACCOUNT_DEACTIVATION_SUCCESS, ACCOUNT_INCORRECT_PASSWORD, ACCOUNT_PASSWORD_REQUIRED
+from . import hashing
+from .forms import RegisterForm, LoginForm, ResendActivationCodeForm, PasswordResetForm, ForgotPasswordForm
+from .metrics import LOGINS, PASSWORD_RESETS
+from .mixin import AsyncLoginRequiredForApiMixin, AsyncThrottleMixin
+from .models import Activation, User
+from .utils import claim_resend, release_resend, send_activation_email, send_reset_password_email
+
+# Async versions of the JSON APIs in accounts.views, served when ACCOUNT_ASYNC_VIEWS is on (core.asgi).
+# Password hashing runs off the event loop through accounts.hashing, ORM work either uses the async
+# QuerySet API or runs in the thread-sensitive ORM thread via sync_to_async.
+
+
+async def aget_user(request):
+    def get_user():
+        # Resolve the lazy user (session and user lookups) in the ORM thread.
+        return request.user if request.user.is_authenticated else None
+    return await sync_to_async(get_user)()
+
+
+async def set_password(user, password):
+    user.password = await hashing.amake_password(password)
+    user._password = password
+    await sync_to_async(user.save)(update_fields=['password'])
+
+
+class RegisterApi(AsyncThrottleMixin, View):
+    """
+    description: Async version of accounts.views.RegisterApi.
+    permission: Must Be Anonymous user
+    """
+
+    throttle_scope = 'register'
+    query_budget = 5
+
+    async def post(self, request, *args, **kwargs):
+        form = RegisterForm(request.POST)
+        if not await sync_to_async(form.is_valid)():
+            return JsonResponse(dict(form.errors.items()))
+
+        encoded_password = await hashing.amake_password(form.cleaned_data.get('password1'))
+        await sync_to_async(self.register)(request, form, encoded_password)
+
+        data = form.cleaned_data
+        data['status'] = ACCOUNT_REGISTER_SUCCESS
+        return JsonResponse(data)
+
+    @staticmethod
+    def register(request, form, encoded_password):
+        with transaction.atomic():
+            user = form.save(encoded_password=encoded_password)
+            code = user.get_activation_code()
+            send_activation_email(request, user.email, code)
+
+
+class ActivateApi(View):
+    """
+    description: Async version of accounts.views.ActivateApi.
+    :raise: 404 object not found if code is incorrect.
+    """
+
+    query_budget = 5
+
+    async def get(self, request, code=None, *args, **kwargs):
+        if settings.ACCOUNT_ACTIVATION_MODE == 'signed':
+            if not await sync_to_async(User.activate_with_token)(code):
+                return JsonResponse({'message': ACCOUNT_ACTIVATION_FAILED})
+            return JsonResponse({'message': ACCOUNT_ACTIVATION_SUCCESS})
+
+        try:
+            act = await Activation.objects.select_related('user').aget(code=code)
+        except Activation.DoesNotExist:
+            raise Http404
+
+        if not act.is_valid():
+            return JsonResponse({'message': ACCOUNT_ACTIVATION_FAILED})
+
+        await sync_to_async(act.activate)()
+
+        return JsonResponse({'message': ACCOUNT_ACTIVATION_SUCCESS})
+
+
+class LoginApi(AsyncThrottleMixin, View):
+    """
+    description: Async version of accounts.views.LoginApi.
+    permission: Must Be Anonymous user
+    """
+
+    throttle_scope = 'login'
+    query_budget = 7
+
+    @method_decorator(csrf_exempt)
+    async def dispatch(self, request, *args, **kwargs):
+        return await super(LoginApi, self).dispatch(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        form = LoginForm(request.POST, verify_password=False)
+
+        if not await sync_to_async(form.is_valid)():
+            LOGINS.labels('failure').inc()
+            return JsonResponse(dict(form.errors.items()))
+
+        user = form.get_user()
+        if not await hashing.acheck_password(user, form.cleaned_data.get('password')):
+            form.add_error('password', ACCOUNT_INCORRECT_PASSWORD)
+            LOGINS.labels('failure').inc()
+            return JsonResponse(dict(form.errors.items()))
+
+        await sync_to_async(login)(request, user, backend=ACCOUNT_MODEL_BACKEND)
+        LOGINS.labels('success').inc()
+        return JsonResponse({'message': ACCOUNT_LOGIN_SUCCESS})
+
+
+class LogoutApi(AsyncLoginRequiredForApiMixin, View):
+    """
+    description: Async version of accounts.views.LogoutApi.
+    permission: Must Be LoggedIn user
+    """
+
+    query_budget = 4
+
+    async def get(self, request, *args, **kwargs):
+        await sync_to_async(logout)(request)
+        return JsonResponse({'message': ACCOUNT_LOGOUT_SUCCESS})
+
+
+class ResendActivationCodeApi(AsyncThrottleMixin, View):
+    """
+    description: Async version of accounts.views.ResendActivationCodeApi.
+    permission: Must Be Anonymous user
+    """
+
+    throttle_scope = 'resend-activation'
+    query_budget = 6
+
+    async def post(self, request, *args, **kwargs):
+        form = ResendActivationCodeForm(request.POST)
+
+        if not await sync_to_async(form.is_valid)():
+            return JsonResponse(dict(form.errors.items()))
+
+        await sync_to_async(self.resend)(request, form.cleaned_data.get('email'))
+
+        return JsonResponse({'message': ACCOUNT_RESENT_ACTIVATION})
+
+    @staticmethod
+    def resend(request, email):
+        if not claim_resend(email):
+            return
+        try:
+            user = User.objects.filter_by_email(email).get()
+            with transaction.atomic():
+                code = user.get_activation_code(reuse=True)
+                send_activation_email(request, user.email, code)
+        except Exception:
+            release_resend(email)
+            raise
+
+
+class PasswordResetApi(AsyncLoginRequiredForApiMixin, View):
+    """
+    description: Async version of accounts.views.PasswordResetApi.
+    permission: Must Be LoggedIn user
+    """
+
+    query_budget = 5
+
+    async def post(self, request, *args, **kwargs):
+        user = await aget_user(request)
+        # The old password is verified below, off the event loop, instead of in the form.
+        form = PasswordResetForm(request.POST, user=user)
+        form.is_valid()
+
+        old_password = form.cleaned_data.get('old_password')
+        if not old_password:
+            form.add_error('old_password', ACCOUNT_PASSWORD_REQUIRED)
+        if not await hashing.acheck_password(user, old_password):
+            form.add_error('old_password', ACCOUNT_INCORRECT_PASSWORD)
+
+        if form.errors:
+            return JsonResponse(dict(form.errors.items()))
+
+        await set_password(user, form.cleaned_data.get('password1'))
+        await sync_to_async(logout)(request)
+        return JsonResponse({'message': ACCOUNT_PASSWORD_RESET_SUCCESS})
+
+
+class ForgotPasswordApi(AsyncThrottleMixin, View):
+    """
+    description: Async version of accounts.views.ForgotPasswordApi.
+    permission: Must Be Anonymous user
+    """
+
+    throttle_scope = 'forgot-password'
+    query_budget = 3
+
+    async def post(self, request, *args, **kwargs):
+        form = ForgotPasswordForm(request.POST)
+
+        if not await sync_to_async(form.is_valid)():
+            return JsonResponse(dict(form.errors.items()))
+
+        user = await User.objects.filter_by_email(form.cleaned_data.get('email')).aget()
+        token = default_token_generator.make_token(user)
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+
+        await sync_to_async(send_reset_password_email)(request, user.email, token, uid)
+
+        return JsonResponse({'message': ACCOUNT_PASSWORD_RESET_LINK_SENT})
+
+
+class RestorePasswordConfirmApi(View):
+    """
+    description: Async version of accounts.views.RestorePasswordConfirmApi.
+    permission: Must Be Anonymous user
+    """
+
+    query_budget = 2
+
+    async def post(self, request, uidb64=None, token=None, *args, **kwargs):
+        form = PasswordResetForm(request.POST)
+
+        if not form.is_valid():
+            return JsonResponse(dict(form.errors.items()))
+        try:
+            uid = urlsafe_base64_decode(uidb64)
+            user = await User.objects.aget(pk=uid)
+            is_token_valid = default_token_generator.check_token(user, token)
+            if is_token_valid:
+                await set_password(user, form.cleaned_data.get('password1'))
+                await sync_to_async(logout)(request)
+                PASSWORD_RESETS.labels('completed').inc()
+                return JsonResponse({'message': ACCOUNT_PASSWORD_RESET_SUCCESS})
+            return JsonResponse({'error': ACCOUNT_PASSWORD_RESET_INVALID_LINK})
+        except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+            return JsonResponse({'error': ACCOUNT_PASSWORD_RESET_INVALID_LINK})
+
+
+class DeactivateAccountApi(AsyncLoginRequiredForApiMixin, View):
+    """
+    description: Async version of accounts.views.DeactivateAccountApi.
+    permission: Must Be LoggedIn user
+    """
+
+    query_budget = 5
+
+    async def get(self, request):
+        user = await aget_user(request)
+        user.is_active = False
+        await sync_to_async(user.save)()
+        await sync_to_async(logout)(request)
+        return JsonResponse({'message': ACCOUNT_DEACTIVATION_SUCCESS})
@@ -0,0 +1,299 @@
+import gc
+import itertools
+import statistics
+import threading
+import time
+import tracemalloc
+
+from django.contrib.auth import hashers
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from social_django.models import UserSocialAuth
+
+from .models import Activation, User
+from .tasks import dispatch_outbox, rebuild_email_bloom_task
+
+PASSWORD = 'Benchmark-pass-123'
+NEW_PASSWORD = 'Benchmark-pass-456'
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class RecordingEmailBackend(BaseEmailBackend):
+    """
+    Email backend taking ``delay`` seconds per message, like a remote SMTP server, that records when each
+    recipient's mail went out in ``sent``.
+    """
+
+    delay = 0
+    sent = {}
+    lock = threading.Lock()
+
+    def send_messages(self, messages):
+        for message in messages:
+            time.sleep(self.delay)
+            with self.lock:
+                self.sent[message.to[0]] = time.perf_counter()
+        return len(messages)
+
+
+class Fixtures:
+    """
+    Seed data shared by the scenarios: ``users`` active users (a quarter linked to GitHub) and a tenth as many
+    pending users with activation rows. Every user has the same password so it is hashed only once.
+    """
+
+    def __init__(self, users):
+        self.encoded_password = hashers.make_password(PASSWORD)
+        self.counter = itertools.count()
+        self.active = self.seed('user', users, is_active=True)
+        self.pending = self.seed('pending', max(1, users // 10), is_active=False)
+        UserSocialAuth.objects.bulk_create(
+            [UserSocialAuth(user_id=pk, provider='github', uid=str(pk), extra_data={}) for pk in self.active[::4]],
+            batch_size=1000,
+        )
+        Activation.objects.bulk_create(
+            [Activation(user_id=pk, code=f'seed-{pk}') for pk in self.pending], batch_size=1000,
+        )
+        self.staff = self.create_user(is_staff=True)
+        self.emails = dict(User.objects.filter(pk__in=self.active[:1000]).values_list('pk', 'email'))
+        # Built up front so no measured request waits for or queues the build.
+        rebuild_email_bloom_task()
+
+    def seed(self, prefix, count, is_active):
+        User.objects.bulk_create(
+            [User(email=f'{prefix}{i}@example.com', password=self.encoded_password, is_active=is_active)
+             for i in range(count)],
+            batch_size=1000,
+        )
+        return list(User.objects.filter(email__startswith=prefix).order_by('pk').values_list('pk', flat=True))
+
+    def create_user(self, **fields):
+        fields.setdefault('is_active', True)
+        return User.objects.create(email=f'fresh{next(self.counter)}@example.com', password=self.encoded_password,
+                                   **fields)
+
+    def active_email(self, i):
+        emails = list(self.emails.values())
+        return emails[i % len(emails)]
+
+    def logged_in(self, user=None):
+        client = Client()
+        client.force_login(user or self.create_user())
+        return client
+
+
+# Routes run once per value of a setting, reported as <route>:<value>.
+SETTING_VARIANTS = {
+    'activate-api': ('ACCOUNT_ACTIVATION_MODE', ('db', 'signed')),
+}
+
+
+def get_variants(name):
+    """
+    Return [(result name, settings overrides)] for the scenario ``name``.
+    """
+    if name not in SETTING_VARIANTS:
+        return [(name, {})]
+    setting, values = SETTING_VARIANTS[name]
+    return [(f'{name}:{value}', {setting: value}) for value in values]
+
+
+def build_scenarios(fixtures):
+    """
+    Map each named route in accounts.urls, plus the OAuth completion against the stub provider, to a function
+    preparing (client, method, path, data) for iteration i. Preparation (fresh users, logins, codes) is not part
+    of the measurement.
+    """
+    f = fixtures
+
+    def register(i):
+        email = f'register{next(f.counter)}@example.com'
+        return Client(), 'post', reverse('register-api'), {
+            'email': email, 'password1': PASSWORD, 'password2': PASSWORD}
+
+    def login_api(i):
+        return Client(), 'post', reverse('login-api'), {'email': f.active_email(i), 'password': PASSWORD}
+
+    def logout_api(i):
+        return f.logged_in(), 'get', reverse('logout-api'), None
+
+    def password_reset(i):
+        return f.logged_in(), 'post', reverse('password-reset-api'), {
+            'old_password': PASSWORD, 'password1': NEW_PASSWORD, 'password2': NEW_PASSWORD}
+
+    def forgot_password(i):
+        return Client(), 'post', reverse('forgot-password-api'), {'email': f.active_email(i)}
+
+    def restore_password(i):
+        user = f.create_user()
+        path = reverse('restore-password-api', kwargs={
+            'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': default_token_generator.make_token(user),
+        })
+        return Client(), 'post', path, {'password1': NEW_PASSWORD, 'password2': NEW_PASSWORD}
+
+    def activate(i):
+        code = f.create_user(is_active=False).get_activation_code()
+        return Client(), 'get', reverse('activate-api', kwargs={'code': code}), None
+
+    def resend_activation(i):
+        user = f.create_user(is_active=False)
+        return Client(), 'post', reverse('resend-activation-code-api'), {'email': user.email}
+
+    repeat_user = []
+
+    def resend_activation_repeat(i):
+        # One impatient user pressing "resend" over and over.
+        if not repeat_user:
+            repeat_user.append(f.create_user(is_active=False))
+        return Client(), 'post', reverse('resend-activation-code-api'), {'email': repeat_user[0].email}
+
+    def deactivate(i):
+        return f.logged_in(), 'get', reverse('deactivate-api'), None
+
+    def export_users(i):
+        return f.logged_in(f.staff), 'get', reverse('export-users-api') + '?provider=github', None
+
+    def settings_page(i):
+        user = f.create_user()
+        UserSocialAuth.objects.create(user=user, provider='github', uid=f'fresh-{user.pk}', extra_data={})
+        return f.logged_in(user), 'get', reverse('settings'), None
+
+    def set_password(i):
+        return f.logged_in(), 'post', reverse('password'), {'password1': NEW_PASSWORD, 'password2': NEW_PASSWORD}
+
+    def login_view(i):
+        return Client(), 'post', reverse('login'), {'email': f.active_email(i), 'password': PASSWORD}
+
+    def register_view(i):
+        email = f'register{next(f.counter)}@example.com'
+        return Client(), 'post', reverse('register'), {
+            'email': email, 'password1': PASSWORD, 'password2': PASSWORD}
+
+    def logout_view(i):
+        return f.logged_in(), 'get', reverse('logout'), None
+
+    def social_complete(i):
+        # Walk the stub provider's authorize redirect untimed, then time the completion: state check, token
+        # and profile calls through the pooled transport, and the pipeline. Ten accounts, so mostly repeat logins.
+        client = Client()
+        response = client.get(reverse('social:begin', args=['stub']), {'login_hint': f'stub{i % 10}'})
+        response = client.get(response.url)
+        return client, 'get', response.url, None
+
+    return {
+        'register-api': register,
+        'login-api': login_api,
+        'logout-api': logout_api,
+        'password-reset-api': password_reset,
+        'forgot-password-api': forgot_password,
+        'restore-password-api': restore_password,
+        'activate-api': activate,
+        'resend-activation-code-api': resend_activation,
+        'resend-activation-code-api:repeat': resend_activation_repeat,
+        'deactivate-api': deactivate,
+        'export-users-api': export_users,
+        'settings': settings_page,
+        'password': set_password,
+        'login': login_view,
+        'register': register_view,
+        'logout': logout_view,
+        'social:complete': social_complete,
+    }
+
+
+def send(client, method, path, data):
+    response = getattr(client, method)(path, data) if data is not None else getattr(client, method)(path)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def run_scenario(prepare, iterations, memory_iterations):
+    """
+    Time ``iterations`` requests (latency, queries, writes, status) then trace allocations over
+    ``memory_iterations`` separate requests, so tracemalloc overhead does not skew the timings. The outbox is
+    dispatched untimed after each request to count the mails it caused.
+    """
+    latencies, queries, writes, errors = [], [], [], 0
+    dispatch_outbox()
+    mail.outbox = []
+    for i in range(iterations):
+        request = prepare(i)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = send(*request)
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(captured))
+        writes.append(sum(query['sql'].lstrip().upper().startswith(WRITES) for query in captured.captured_queries))
+        errors += response.status_code >= 500
+        dispatch_outbox()
+    mails = len(mail.outbox)
+
+    allocated = []
+    tracemalloc.start()
+    try:
+        for i in range(memory_iterations):
+            request = prepare(iterations + i)
+            gc.collect()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            send(*request)
+            allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'requests_per_sec': iterations / sum(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'queries': statistics.mean(queries),
+        'max_queries': max(queries),
+        'writes': statistics.mean(writes),
+        'mails': mails / iterations,
+        'allocated_kib': statistics.mean(allocated) / 1024 if allocated else None,
+        'errors': errors,
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    Return a list of regression messages: p95 latency or allocations more than ``threshold`` percent higher,
+    throughput more than ``threshold`` percent lower, or more queries, writes or mails per request than in the
+    baseline.
+    """
+    regressions = []
+    for name, new in current['endpoints'].items():
+        old = baseline['endpoints'].get(name)
+        if old is None:
+            continue
+        limit = 1 + threshold / 100
+        if new['p95_ms'] > old['p95_ms'] * limit:
+            regressions.append(f"{name}: p95 {old['p95_ms']:.1f}ms -> {new['p95_ms']:.1f}ms")
+        if new['requests_per_sec'] * limit < old['requests_per_sec']:
+            regressions.append(
+                f"{name}: throughput {old['requests_per_sec']:.1f}/s -> {new['requests_per_sec']:.1f}/s")
+        if new['queries'] > old['queries']:
+            regressions.append(f"{name}: queries {old['queries']:.1f} -> {new['queries']:.1f}")
+        for key in ('writes', 'mails'):
+            # Baselines recorded before these were measured have no value to compare against.
+            if key in old and new[key] > old[key]:
+                regressions.append(f"{name}: {key} {old[key]:.2f} -> {new[key]:.2f}")
+        if old['allocated_kib'] and new['allocated_kib'] and new['allocated_kib'] > old['allocated_kib'] * limit:
+            regressions.append(
+                f"{name}: allocated {old['allocated_kib']:.0f}KiB -> {new['allocated_kib']:.0f}KiB")
+    return regressions
@@ -0,0 +1,271 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .metrics import EMAIL_BLOOM_CHECKS
+
+logger = logging.getLogger(__name__)
+
+BLOOM_KEY = 'accounts:email-bloom'
+BLOOM_BUILDING_KEY = 'accounts:email-bloom:building'
+BLOOM_IMPORT_KEY = 'accounts:email-bloom:import'
+# When the last rebuild started, and a marker so one process queues the rebuild of a missing filter.
+BLOOM_BUILT_AT_KEY = 'accounts:email-bloom:built-at'
+BLOOM_REBUILD_QUEUED_KEY = 'accounts:email-bloom:rebuild-queued'
+REBUILD_QUEUED_TIMEOUT = 600
+
+# Set the bits in every key that exists. The live filter is never created by an add, only by a rebuild,
+# so a missing key always means "not built yet" rather than a partial filter.
+BLOOM_ADD_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        for _, offset in ipairs(ARGV) do
+            redis.call('SETBIT', key, offset, 1)
+        end
+    end
+end
+"""
+
+# 1 if every bit is set, 0 if one is not, -1 if the filter has not been built.
+BLOOM_CONTAINS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+for _, offset in ipairs(ARGV) do
+    if redis.call('GETBIT', KEYS[1], offset) == 0 then
+        return 0
+    end
+end
+return 1
+"""
+
+
+def get_size(capacity, error_rate):
+    """
+    Return the (bits, hash count) of a filter holding ``capacity`` emails at ``error_rate`` false positives.
+    """
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    return bits, max(1, round(bits / capacity * math.log(2)))
+
+
+def get_positions(email, bits, hashes):
+    # Double hashing over one 128-bit digest (Kirsch-Mitzenmacher), keyed like the lower(email) unique index.
+    digest = hashlib.blake2b((email or '').lower().encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+def set_bits(bitmap, positions):
+    # Same bit order as Redis SETBIT: offset 0 is the most significant bit of the first byte.
+    for offset in positions:
+        bitmap[offset >> 3] |= 0x80 >> (offset & 7)
+
+
+def build_bitmap(emails, bits, hashes):
+    bitmap = bytearray((bits + 7) // 8)
+    count = 0
+    for email in emails:
+        set_bits(bitmap, get_positions(email, bits, hashes))
+        count += 1
+    return bitmap, count
+
+
+def iter_registered_emails():
+    from .models import User
+    return User.objects.values_list('email', flat=True).iterator(chunk_size=settings.ACCOUNT_EXPORT_CHUNK_SIZE)
+
+
+class BaseEmailFilter:
+
+    def __init__(self):
+        self.bits, self.hashes = get_size(
+            settings.ACCOUNT_EMAIL_BLOOM_CAPACITY, settings.ACCOUNT_EMAIL_BLOOM_ERROR_RATE
+        )
+        self.stale_since = None
+
+    def is_stale(self):
+        """
+        True after an email could be neither added nor the filter dropped, until a rebuild started after that.
+        """
+        if self.stale_since is None:
+            return False
+        built_at = self.built_at()
+        if built_at is not None and built_at > self.stale_since:
+            self.stale_since = None
+            return False
+        self.schedule_rebuild()
+        return True
+
+    def positions(self, email):
+        return get_positions(email, self.bits, self.hashes)
+
+    def all_positions(self, emails):
+        return [offset for email in emails for offset in self.positions(email)]
+
+    @property
+    def memory_bytes(self):
+        return (self.bits + 7) // 8
+
+
+class RedisEmailFilter(BaseEmailFilter):
+    """
+    Bloom filter of registered emails kept as a bitset in the default django_redis cache, shared by every
+    process. Answers "maybe" until the first rebuild (accounts.tasks.rebuild_email_bloom_task), which the
+    first lookup of a missing filter queues.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._add = None
+        self._contains = None
+
+    def client(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+
+    def contains(self, email):
+        if self._contains is None:
+            self._contains = self.client().register_script(BLOOM_CONTAINS_SCRIPT)
+        result = self._contains(keys=[BLOOM_KEY], args=self.positions(email))
+        if result == -1:
+            self.schedule_rebuild()
+            return None
+        return bool(result)
+
+    def add(self, emails):
+        if self._add is None:
+            self._add = self.client().register_script(BLOOM_ADD_SCRIPT)
+        self._add(keys=[BLOOM_KEY, BLOOM_BUILDING_KEY], args=self.all_positions(emails))
+
+    def rebuild(self):
+        """
+        Build the filter from accounts_user into a separate key and swap it in with RENAME. Emails added while
+        the table is scanned also go to the new key, so none are lost in the swap.
+        """
+        client = self.client()
+        started = time.time()
+        client.delete(BLOOM_BUILDING_KEY)
+        client.setbit(BLOOM_BUILDING_KEY, self.bits - 1, 0)
+        bitmap, count = build_bitmap(iter_registered_emails(), self.bits, self.hashes)
+        client.set(BLOOM_IMPORT_KEY, bytes(bitmap))
+        client.bitop('OR', BLOOM_BUILDING_KEY, BLOOM_BUILDING_KEY, BLOOM_IMPORT_KEY)
+        client.delete(BLOOM_IMPORT_KEY)
+        client.rename(BLOOM_BUILDING_KEY, BLOOM_KEY)
+        client.set(BLOOM_BUILT_AT_KEY, started)
+        client.delete(BLOOM_REBUILD_QUEUED_KEY)
+        return count
+
+    def reset(self):
+        self.client().delete(BLOOM_KEY)
+
+    def built_at(self):
+        built_at = self.client().get(BLOOM_BUILT_AT_KEY)
+        return float(built_at) if built_at is not None else None
+
+    def schedule_rebuild(self):
+        """
+        Queue rebuild_email_bloom_task, once for all processes until it completes or REBUILD_QUEUED_TIMEOUT
+        passes. Lookups answer "maybe" in the meantime.
+        """
+        from .tasks import rebuild_email_bloom_task
+        if self.client().set(BLOOM_REBUILD_QUEUED_KEY, 1, nx=True, ex=REBUILD_QUEUED_TIMEOUT):
+            rebuild_email_bloom_task.delay()
+
+
+class MemoryEmailFilter(BaseEmailFilter):
+    """
+    Per-process filter built from accounts_user on first use. Only emails added in this process are seen,
+    so it is for tests, benchmarks and single-process deployments.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._bitmap = None
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def contains(self, email):
+        if self._bitmap is None:
+            self.rebuild()
+        bitmap = self._bitmap
+        return all(bitmap[offset >> 3] & (0x80 >> (offset & 7)) for offset in self.positions(email))
+
+    def add(self, emails):
+        with self._lock:
+            if self._bitmap is not None:
+                set_bits(self._bitmap, self.all_positions(emails))
+
+    def rebuild(self):
+        started = time.time()
+        bitmap, count = build_bitmap(iter_registered_emails(), self.bits, self.hashes)
+        with self._lock:
+            self._bitmap = bitmap
+            self._built_at = started
+        return count
+
+    def reset(self):
+        self._bitmap = None
+
+    def built_at(self):
+        return self._built_at
+
+    def schedule_rebuild(self):
+        self.rebuild()
+
+
+_filter = None
+
+
+def get_filter():
+    """
+    Return the configured email filter, or None when ACCOUNT_EMAIL_BLOOM_BACKEND is empty.
+    """
+    global _filter
+    if _filter is None and settings.ACCOUNT_EMAIL_BLOOM_BACKEND:
+        _filter = import_string(settings.ACCOUNT_EMAIL_BLOOM_BACKEND)()
+    return _filter
+
+
+def might_exist(email):
+    """
+    False only if ``email`` is certainly not registered. Errors and an unbuilt filter answer True, so the
+    caller falls back to the database.
+    """
+    email_filter = get_filter()
+    if email_filter is None or not email:
+        return True
+    try:
+        result = None if email_filter.is_stale() else email_filter.contains(email)
+    except Exception:
+        logger.exception('Email filter lookup failed')
+        result = None
+    EMAIL_BLOOM_CHECKS.labels({None: 'unknown', True: 'positive', False: 'negative'}[result]).inc()
+    return result is not False
+
+
+def add(*emails):
+    email_filter = get_filter()
+    if email_filter is None or not emails:
+        return
+    try:
+        email_filter.add(emails)
+    except Exception:
+        # A missed add would turn into a false negative, i.e. a registered user being rejected.
+        logger.exception('Email filter update failed, dropping the filter until it is rebuilt')
+        try:
+            email_filter.reset()
+        except Exception:
+            # The filter may still be live without this email: answer "maybe" here until a rebuild.
+            logger.exception('Could not drop the email filter, not using it until it is rebuilt')
+            email_filter.stale_since = time.time()
+
+
+def add_user(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or update_fields is None or 'email' in update_fields:
+        add(instance.email)
@@ -0,0 +1,83 @@
+import csv
+import datetime
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from social_django.models import UserSocialAuth
+
+from .models import User
+
+EXPORT_FIELDS = ('id', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'date_joined', 'last_login')
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+
+def parse_bound(value):
+    """
+    Parse an ISO date or datetime filter value into an aware datetime, or None.
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def get_export_queryset(joined_after=None, joined_before=None, is_active=None, provider=None):
+    queryset = User.objects.order_by('pk')
+    if joined_after:
+        queryset = queryset.filter(date_joined__gte=joined_after)
+    if joined_before:
+        queryset = queryset.filter(date_joined__lt=joined_before)
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active)
+    if provider:
+        queryset = queryset.filter(pk__in=UserSocialAuth.objects.filter(provider=provider).values('user_id'))
+    return queryset
+
+
+def iter_users(queryset, chunk_size=2000):
+    """
+    Yield user dicts with their social auth providers. Users are read through a server-side cursor and
+    providers are fetched with one query per chunk, so memory does not grow with the table.
+    """
+    rows = queryset.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        providers = defaultdict(list)
+        social = UserSocialAuth.objects.filter(user_id__in=[row['id'] for row in chunk])
+        for user_id, provider in social.values_list('user_id', 'provider'):
+            providers[user_id].append(provider)
+        for row in chunk:
+            row['providers'] = sorted(providers.get(row['id'], []))
+            yield row
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS + ('providers',))
+    for row in rows:
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS] + [' '.join(row['providers'])])
+
+
+def render_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + '\n'
+
+
+RENDERERS = {'csv': render_csv, 'jsonl': render_jsonl}
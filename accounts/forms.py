@@ -14,7 +14,7 @@ class RegisterForm(forms.Form):
     def clean_email(self):
         email = self.data.get('email')
 
-        if email in User.get_user_emails():
+        if User.get_account_state(email).exists:
             self.add_error('email', ACCOUNT_ALREADY_EXIST_EMAIL)
         return email
 
@@ -25,49 +25,61 @@ class RegisterForm(forms.Form):
             self.add_error('password2', ACCOUNT_PASSWORD_NOT_MATCHING)
         return password2
 
-    def save(self):
+    def save(self, encoded_password=None):
         email = self.data.get('email')
+        if encoded_password is not None:
+            return User.objects.create(email=User.objects.normalize_email(email), password=encoded_password,
+                                       is_active=False)
         password = self.data.get('password1')
-        user = User.objects.create_user(email=email, password=password)
-        user.is_active = False
-        user.save()
-        return user
+        return User.objects.create_user(email=email, password=password, is_active=False)
 
 
 class LoginForm(forms.Form):
     email = forms.EmailField(required=True)
     password = forms.CharField(required=True)
 
+    def __init__(self, *args, **kwargs):
+        # Async views pass verify_password=False and verify the password off the event loop.
+        self.verify_password = kwargs.pop('verify_password', True)
+        self.user_cache = None
+        super(LoginForm, self).__init__(*args, **kwargs)
+
     def clean_email(self):
         email = self.data.get('email')
+        user = User.objects.get_for_auth(email)
 
-        if email not in User.get_user_emails():
+        if user is None:
             self.add_error('email', ACCOUNT_EMAIL_NOT_REGISTERED)
-        elif not User.is_active_user(email=email):
+        elif not user.is_active:
             self.add_error('email', ACCOUNT_EMAIL_NOT_VERIFIED)
+        else:
+            self.user_cache = user
 
         return email
 
     def clean_password(self):
         password = self.data.get('password')
-        email = self.data.get('email')
 
-        query = User.objects.filter(email=email, is_active=True)
-        if query.exists() and not query.first().check_password(password):
+        if self.verify_password and self.user_cache and not self.user_cache.check_password(password):
             self.add_error('password', ACCOUNT_INCORRECT_PASSWORD)
+            self.user_cache = None
 
         return password
 
+    def get_user(self):
+        return self.user_cache
+
 
 class ResendActivationCodeForm(forms.Form):
     email = forms.EmailField(required=True)
 
     def clean_email(self):
         email = self.data.get('email')
+        state = User.get_account_state(email)
 
-        if email not in User.get_user_emails():
+        if not state.exists:
             self.add_error('email', ACCOUNT_EMAIL_NOT_REGISTERED)
-        elif User.is_active_user(email=email):
+        elif state.is_active:
             self.add_error('email', ACCOUNT_ALREADY_ACTIVE_EMAIL)
 
         return email
@@ -114,10 +126,11 @@ class ForgotPasswordForm(forms.Form):
 
     def clean_email(self):
         email = self.data.get('email')
+        state = User.get_account_state(email)
 
-        if email not in User.get_user_emails():
+        if not state.exists:
             self.add_error('email', ACCOUNT_EMAIL_NOT_REGISTERED)
-        elif User.is_inactive_user(email=email):
+        elif not state.is_active:
             self.add_error('email', ACCOUNT_EMAIL_NOT_VERIFIED)
 
         return email
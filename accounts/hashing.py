@@ -0,0 +1,106 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from .instrumentation import timed
+from .metrics import PASSWORD_HASH_DURATION
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _init_worker():
+    django.setup()
+
+
+def create_executor(size):
+    context = multiprocessing.get_context(settings.PASSWORD_HASHING_POOL_START_METHOD)
+    return ProcessPoolExecutor(max_workers=size, mp_context=context, initializer=_init_worker)
+
+
+def get_executor():
+    """
+    Return the per-process hashing pool, or None when hashing runs inline (PASSWORD_HASHING_POOL_SIZE = 0).
+    """
+    global _executor, _slots
+    size = settings.PASSWORD_HASHING_POOL_SIZE
+    if not size:
+        return None
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(size * settings.PASSWORD_HASHING_POOL_BACKLOG)
+                _executor = create_executor(size)
+    return _executor
+
+
+def run(func, *args):
+    executor = get_executor()
+    with timed('hash'), PASSWORD_HASH_DURATION.labels(func.__name__).time():
+        if executor is None:
+            return func(*args)
+        # Callers block here once the backlog is full instead of queueing unbounded work.
+        with _slots:
+            return executor.submit(func, *args).result()
+
+
+def make_password(password, hasher='default'):
+    if password is None:
+        return hashers.make_password(None)
+    return run(hashers.make_password, password, None, hasher)
+
+
+def must_update(encoded):
+    preferred = hashers.get_hasher('default')
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def check_password(user, password):
+    """
+    Verify the password against user.password and upgrade the stored hash to the preferred hasher on success.
+    """
+    encoded = user.password
+    if password is None or not hashers.is_password_usable(encoded):
+        return False
+    if not run(hashers.check_password, password, encoded):
+        return False
+    if must_update(encoded):
+        user.password = make_password(password)
+        user.save(update_fields=['password'])
+    return True
+
+
+async def arun(func, *args):
+    # The waiting thread blocks on the pool (or hashes inline), never the event loop.
+    return await sync_to_async(run, thread_sensitive=False)(func, *args)
+
+
+async def amake_password(password, hasher='default'):
+    if password is None:
+        return hashers.make_password(None)
+    return await arun(hashers.make_password, password, None, hasher)
+
+
+async def acheck_password(user, password):
+    """
+    Async check_password. The hash runs off the event loop, the rehash save runs in the ORM thread.
+    """
+    encoded = user.password
+    if password is None or not hashers.is_password_usable(encoded):
+        return False
+    if not await arun(hashers.check_password, password, encoded):
+        return False
+    if must_update(encoded):
+        user.password = await amake_password(password)
+        await sync_to_async(user.save)(update_fields=['password'])
+    return True
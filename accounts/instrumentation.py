@@ -0,0 +1,128 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+# Timings of the request being handled. The recorder is a mutable object so that work done in
+# sync_to_async threads (which run in a copy of the context) is still added to the same request.
+_current = ContextVar('accounts_request_timings', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestTimings:
+    __slots__ = ('start', 'durations', 'counts')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = {'db': 0.0, 'hash': 0.0, 'template': 0.0, 'enqueue': 0.0}
+        self.counts = {'db': 0, 'cache_hit': 0, 'cache_miss': 0}
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total):
+        durations, counts = self.durations, self.counts
+        return ', '.join((
+            f'db;dur={durations["db"] * 1000:.1f};desc="{counts["db"]} queries"',
+            f'cache;desc="{counts["cache_hit"]} hit {counts["cache_miss"]} miss"',
+            f'hash;dur={durations["hash"] * 1000:.1f}',
+            f'template;dur={durations["template"] * 1000:.1f}',
+            f'enqueue;dur={durations["enqueue"] * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+    def as_log_fields(self, total):
+        return {
+            'total_ms': round(total * 1000, 2),
+            'db_queries': self.counts['db'],
+            'db_ms': round(self.durations['db'] * 1000, 2),
+            'cache_hits': self.counts['cache_hit'],
+            'cache_misses': self.counts['cache_miss'],
+            'hash_ms': round(self.durations['hash'] * 1000, 2),
+            'template_ms': round(self.durations['template'] * 1000, 2),
+            'enqueue_ms': round(self.durations['enqueue'] * 1000, 2),
+        }
+
+
+def begin():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] += time.perf_counter() - start
+
+
+def count(name):
+    timings = _current.get()
+    if timings is not None:
+        timings.counts[name] += 1
+
+
+def record_cache(hit):
+    count('cache_hit' if hit else 'cache_miss')
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper installed on every connection (see AccountsConfig.ready). Outside a request it only
+    costs the context variable lookup.
+    """
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.durations['db'] += time.perf_counter() - start
+        timings.counts['db'] += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Template(django_backend.Template):
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    The Django template backend with render time recorded on the current request.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,165 @@
+import json
+import time
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template import engines
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+from django_redis import get_redis_connection
+
+from .metrics import EMAIL_SEND_DURATION, EMAILS_SENT
+
+MAIL_QUEUE_KEY = 'accounts:mail:queue'
+MAIL_FLUSH_KEY = 'accounts:mail:flush-scheduled'
+MAIL_IN_FLIGHT_KEY = 'accounts:mail:in-flight'
+MAIL_BATCH_KEY = 'accounts:mail:in-flight:{}'
+MAIL_IDEMPOTENCY_KEY = 'accounts:mail:sent:{}'
+
+
+@lru_cache(maxsize=None)
+def get_html_template(template):
+    return get_template(f'accounts/emails/{template}.html')
+
+
+@lru_cache(maxsize=None)
+def get_text_template(template):
+    """
+    Plain-text variant of the email template, derived once per template and worker process.
+    """
+    source = get_html_template(template).template.source
+    return engines['django'].from_string(strip_tags(source))
+
+
+def build_message(subject, template, context, to):
+    return build_messages(subject, template, context, [to])[0]
+
+
+def build_messages(subject, template, context, recipients):
+    """
+    One message per recipient of the same mail, with the templates rendered once.
+    """
+    text = get_text_template(template).render(context)
+    html = get_html_template(template).render(context)
+    messages = []
+    for to in recipients:
+        message = EmailMultiAlternatives(subject, text, to=[to])
+        message.attach_alternative(html, 'text/html')
+        messages.append(message)
+    return messages
+
+
+def send_batch(messages):
+    """
+    Send the messages over one SMTP connection and return the ones that failed.
+    """
+    failed = []
+    connection = get_connection()
+    try:
+        for message in messages:
+            try:
+                with EMAIL_SEND_DURATION.time():
+                    connection.send_messages([message])
+            except Exception:
+                # The connection may be unusable after an error, the next send reopens it.
+                connection.close()
+                failed.append(message)
+                EMAILS_SENT.labels('failure').inc()
+            else:
+                EMAILS_SENT.labels('success').inc()
+    finally:
+        connection.close()
+    return failed
+
+
+def claim(idempotency_key):
+    """
+    Return False if a mail with ``idempotency_key`` was already handed over in the last EMAIL_IDEMPOTENCY_WINDOW
+    seconds, otherwise remember the key and return True. Mails without a key are always sent.
+    """
+    if not idempotency_key or settings.EMAIL_IDEMPOTENCY_WINDOW <= 0:
+        return True
+    if cache.add(MAIL_IDEMPOTENCY_KEY.format(idempotency_key), 1, settings.EMAIL_IDEMPOTENCY_WINDOW):
+        return True
+    EMAILS_SENT.labels('coalesced').inc()
+    return False
+
+
+def release(idempotency_key):
+    if idempotency_key:
+        cache.delete(MAIL_IDEMPOTENCY_KEY.format(idempotency_key))
+
+
+def enqueue(subject, template, context, to):
+    """
+    Add a mail to the batch queue and return the queue length.
+    """
+    payload = json.dumps({'subject': subject, 'template': template, 'context': context, 'to': to})
+    return get_redis_connection('default').rpush(MAIL_QUEUE_KEY, payload)
+
+
+def queue_length():
+    return get_redis_connection('default').llen(MAIL_QUEUE_KEY)
+
+
+def schedule_flush():
+    """
+    Return True if the caller should schedule a flush, False if one is already pending.
+    """
+    return bool(get_redis_connection('default').set(MAIL_FLUSH_KEY, 1, nx=True, ex=settings.EMAIL_BATCH_WINDOW * 2))
+
+
+def clear_flush():
+    get_redis_connection('default').delete(MAIL_FLUSH_KEY)
+
+
+def drain(limit):
+    """
+    Atomically move up to ``limit`` queued mails to a new in-flight batch and return ``(batch, payloads)``.
+    The batch stays in Redis until ``ack`` deletes it, so the mails survive a worker crash or an SMTP outage.
+    """
+    batch = MAIL_BATCH_KEY.format(uuid.uuid4().hex)
+    pipe = get_redis_connection('default').pipeline(transaction=True)
+    for _ in range(limit):
+        pipe.lmove(MAIL_QUEUE_KEY, batch, 'LEFT', 'RIGHT')
+    pipe.zadd(MAIL_IN_FLIGHT_KEY, {batch: time.time()})
+    *payloads, _ = pipe.execute()
+    payloads = [json.loads(payload) for payload in payloads if payload is not None]
+    if not payloads:
+        ack(batch)
+    return batch, payloads
+
+
+def ack(batch):
+    """
+    Forget a batch once every mail in it was sent or handed to deliver_mail_task.
+    """
+    pipe = get_redis_connection('default').pipeline(transaction=True)
+    pipe.delete(batch)
+    pipe.zrem(MAIL_IN_FLIGHT_KEY, batch)
+    pipe.execute()
+
+
+def requeue(batch):
+    """
+    Put the mails of an unfinished batch back at the head of the queue, in their original order.
+    """
+    redis = get_redis_connection('default')
+    while redis.lmove(batch, MAIL_QUEUE_KEY, 'RIGHT', 'LEFT') is not None:
+        pass
+    redis.zrem(MAIL_IN_FLIGHT_KEY, batch)
+
+
+def recover():
+    """
+    Requeue the batches in flight for longer than EMAIL_BATCH_IN_FLIGHT_TIMEOUT seconds, left behind by a worker
+    that died before ``ack``. Returns how many there were.
+    """
+    redis = get_redis_connection('default')
+    batches = redis.zrangebyscore(MAIL_IN_FLIGHT_KEY, '-inf', time.time() - settings.EMAIL_BATCH_IN_FLIGHT_TIMEOUT)
+    for batch in batches:
+        requeue(batch.decode())
+    return len(batches)
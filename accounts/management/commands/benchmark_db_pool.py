@@ -0,0 +1,69 @@
+import sqlite3
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.backends.postgresql_pool.pool import ConnectionPool
+
+
+class Command(BaseCommand):
+    help = 'Compare connect+query+release throughput with and without the connection pool, against the ' \
+           'default PostgreSQL database or an SQLite stand-in.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sqlite', metavar='PATH', help='Benchmark against this SQLite file instead.')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=500, help='Checkouts per thread.')
+        parser.add_argument('--max-size', type=int, default=4)
+        parser.add_argument('--max-overflow', type=int, default=2)
+
+    def handle(self, *args, **options):
+        # The PostgreSQL reset (DISCARD ALL) does not exist in SQLite, the stand-in is only rolled back.
+        reset_query = None
+        if options['sqlite']:
+            def connect():
+                return sqlite3.connect(options['sqlite'], check_same_thread=False)
+        else:
+            reset_query = 'DISCARD ALL'
+            import psycopg2
+            params = connection.get_connection_params()
+
+            def connect():
+                return psycopg2.connect(**params)
+
+        pool = ConnectionPool(connect, max_size=options['max_size'], max_overflow=options['max_overflow'],
+                              reset_query=reset_query)
+        for name, checkout, release in (
+                ('direct', connect, lambda conn: conn.close()),
+                ('pooled', pool.getconn, pool.putconn),
+        ):
+            elapsed = self.run(checkout, release, options['threads'], options['iterations'])
+            total = options['threads'] * options['iterations']
+            self.stdout.write(f'{name}: {total / elapsed:.1f} requests/s ({elapsed * 1e6 / total:.0f}us each)')
+        stats = pool.snapshot()
+        self.stdout.write(f'pool: {stats}')
+        limit = options['max_size'] + options['max_overflow']
+        if stats.get('created', 0) > limit:
+            raise CommandError(f"The pool opened {stats['created']} connections for at most {limit} at once, "
+                               f"so returned connections were discarded instead of reused.")
+
+    @staticmethod
+    def run(checkout, release, threads, iterations):
+        def worker():
+            for _ in range(iterations):
+                conn = checkout()
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1')
+                cursor.fetchall()
+                cursor.close()
+                release(conn)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - start
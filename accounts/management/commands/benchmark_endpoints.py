@@ -0,0 +1,98 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from accounts import benchmarks
+from accounts.urls import urlpatterns
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every named route in accounts.urls in-process against a throwaway test database. ' \
+           'Run with DJANGO_SETTINGS_MODULE=core.settings_benchmark to use in-memory mail, cache and Celery.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Active users to seed.')
+        parser.add_argument('--iterations', type=int, default=200, help='Timed requests per endpoint.')
+        parser.add_argument('--memory-iterations', type=int, default=20,
+                            help='Extra requests per endpoint traced for allocations.')
+        parser.add_argument('--endpoint', action='append', default=[], help='Only run this route, repeatable.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                            help='Compare two result files instead of running.')
+        parser.add_argument('--threshold', type=float, default=10, help='Allowed regression, in percent.')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'])
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"{'endpoint':<36}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'writes':>8}"
+            f"{'mails':>7}{'KiB':>8}{'errors':>8}"
+        )
+        for name, row in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:<36}{row['requests_per_sec']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+                f"{row['p99_ms']:>9.1f}{row['queries']:>9.1f}{row['writes']:>8.1f}{row['mails']:>7.2f}"
+                f"{row['allocated_kib'] or 0:>8.0f}{row['errors']:>8}"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+    def run(self, options):
+        start = time.perf_counter()
+        fixtures = benchmarks.Fixtures(options['users'])
+        self.stdout.write(f'Seeded {options["users"]} users in {time.perf_counter() - start:.1f}s.')
+
+        scenarios = benchmarks.build_scenarios(fixtures)
+        for missing in sorted({pattern.name for pattern in urlpatterns if pattern.name} - set(scenarios)):
+            self.stderr.write(f'No benchmark scenario for {missing}.')
+        selected = options['endpoint'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(f'Unknown endpoint(s): {", ".join(sorted(unknown))}.')
+
+        endpoints = {}
+        for name in selected:
+            # Exports stream the whole table, a handful of runs is enough.
+            iterations = max(1, options['iterations'] // 20) if name == 'export-users-api' else options['iterations']
+            for result_name, overrides in benchmarks.get_variants(name):
+                with override_settings(**overrides):
+                    endpoints[result_name] = benchmarks.run_scenario(
+                        scenarios[name], iterations, min(iterations, options['memory_iterations'])
+                    )
+        return {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'database': connection.vendor,
+                'hasher': settings.PASSWORD_HASHERS[0],
+                # activate-api runs under every mode in benchmarks.SETTING_VARIANTS whatever this is.
+                'activation_mode': settings.ACCOUNT_ACTIVATION_MODE,
+                'async_views': settings.ACCOUNT_ASYNC_VIEWS,
+                'users': options['users'],
+                'iterations': options['iterations'],
+            },
+            'endpoints': endpoints,
+        }
+
+    def compare(self, baseline_path, current_path, threshold):
+        with open(baseline_path) as baseline, open(current_path) as current:
+            regressions = benchmarks.compare(json.load(baseline), json.load(current), threshold)
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(regression))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s) above {threshold}%.')
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,72 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+
+from accounts.benchmarks import percentile
+from accounts.hashing import create_executor
+
+
+class Command(BaseCommand):
+    help = 'Report hashes/sec and latency percentiles per password hasher and hashing pool size.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', nargs='+', default=list(settings.PASSWORD_HASHER_CHOICES),
+                            choices=list(settings.PASSWORD_HASHER_CHOICES))
+        parser.add_argument('--pool-sizes', nargs='+', type=int, default=[0, 2, 4])
+        parser.add_argument('--iterations', type=int, default=100, help='Hashes per hasher and pool size.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Threads submitting hashes concurrently.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        results = []
+        for name in options['hashers']:
+            algorithm = hashers.get_hasher(name).algorithm
+            for pool_size in options['pool_sizes']:
+                results.append(self.measure(algorithm, pool_size, options['iterations'], options['concurrency']))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'hasher':<16}{'pool':>6}{'hashes/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+        for row in results:
+            self.stdout.write(
+                f"{row['hasher']:<16}{row['pool_size']:>6}{row['hashes_per_sec']:>12.1f}"
+                f"{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+            )
+
+    def measure(self, algorithm, pool_size, iterations, concurrency):
+        executor = create_executor(pool_size) if pool_size else None
+
+        def hash_once(i):
+            start = time.perf_counter()
+            if executor is None:
+                hashers.make_password(f'benchmark-{i}', None, algorithm)
+            else:
+                executor.submit(hashers.make_password, f'benchmark-{i}', None, algorithm).result()
+            return time.perf_counter() - start
+
+        try:
+            if executor is not None:
+                # Warm the pool so process start-up is not part of the measurement.
+                list(executor.map(hashers.make_password, ['warmup'] * pool_size))
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as threads:
+                latencies = sorted(threads.map(hash_once, range(iterations)))
+            elapsed = time.perf_counter() - start
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return {
+            'hasher': algorithm,
+            'pool_size': pool_size,
+            'hashes_per_sec': iterations / elapsed,
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+        }
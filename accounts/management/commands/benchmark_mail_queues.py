@@ -0,0 +1,145 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from celery import Celery
+from celery.contrib.testing.worker import TestWorkController, setup_app_for_worker
+from celery.worker import state
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from accounts import tasks
+from accounts.benchmarks import RecordingEmailBackend, percentile
+from accounts.models import User
+from core.celery import app
+
+# The workers run as threads of this process and share its in-memory broker. The apps read the CELERY_
+# namespace of the Django settings, so the overrides carry the prefix too.
+CELERY_CONF = {
+    'CELERY_BROKER_URL': 'memory://localhost/',
+    'CELERY_BROKER_TRANSPORT_OPTIONS': {'polling_interval': 0.01},
+    'CELERY_RESULT_BACKEND': None,
+    'CELERY_TASK_IGNORE_RESULT': True,
+    'CELERY_TASK_ALWAYS_EAGER': False,
+}
+
+REMINDER_CONTEXT = {
+    'task_content': 'Submit the quarterly report',
+    'task_completion_date': '2026-12-31',
+    'task_todo_title': 'Reporting',
+}
+
+
+@contextmanager
+def run_workers(profiles):
+    """
+    Start a thread-pool worker per profile. Each gets its own app, queue selection is per app.
+    """
+    threads = []
+    for name, profile in profiles.items():
+        worker_app = Celery(f'benchmark-{name}', set_as_current=False)
+        worker_app.config_from_object('django.conf:settings', namespace='CELERY')
+        worker_app.conf.update(CELERY_CONF)
+        setup_app_for_worker(worker_app, 'WARNING', None)
+        worker = TestWorkController(
+            app=worker_app, hostname=f'{name}@benchmark', pool='threads', concurrency=profile['concurrency'],
+            prefetch_multiplier=profile['prefetch_multiplier'], queues=profile['queues'], loglevel='WARNING',
+            logfile=None, ready_callback=None, without_heartbeat=True, without_mingle=True, without_gossip=True,
+        )
+        thread = threading.Thread(target=worker.start, daemon=True)
+        thread.start()
+        worker.ensure_started()
+        threads.append(thread)
+    try:
+        yield
+    finally:
+        state.should_terminate = 0
+        for thread in threads:
+            thread.join(30)
+        state.should_terminate = None
+        app.set_current()
+        app.set_default()
+
+
+def wait_for(condition, timeout):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise CommandError(f'Timed out after {timeout}s.')
+        time.sleep(0.01)
+
+
+class Command(BaseCommand):
+    help = 'Measure reset mail latency while a reminder campaign runs, with all mail served by one worker and ' \
+           'with the transactional and bulk queues served by their own CELERY_WORKER_PROFILES workers. ' \
+           'Run with DJANGO_SETTINGS_MODULE=core.settings_benchmark.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=100000, help='Active users the campaign mails.')
+        parser.add_argument('--resets', type=int, default=50, help='Reset mails sent while the campaign runs.')
+        parser.add_argument('--interval', type=float, default=0.05, help='Seconds between reset mails.')
+        parser.add_argument('--send-ms', type=float, default=0.5, help='Simulated SMTP time per message.')
+        parser.add_argument('--timeout', type=float, default=600, help='Seconds to wait for each run.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            User.objects.bulk_create(
+                [User(email=f'reminder{i}@example.com', password='!') for i in range(options['recipients'])],
+                batch_size=1000,
+            )
+            app.conf.update(CELERY_CONF)
+            RecordingEmailBackend.delay = options['send_ms'] / 1000
+
+            profiles = settings.CELERY_WORKER_PROFILES
+            # Same number of threads as the two profiles together, consuming every queue.
+            one_queue = {'shared': {
+                'queues': [queue.name for queue in settings.CELERY_TASK_QUEUES],
+                'concurrency': sum(profile['concurrency'] for profile in profiles.values()),
+                'prefetch_multiplier': profiles['bulk']['prefetch_multiplier'],
+            }}
+            runs = [('no campaign', profiles, False), ('one queue', one_queue, True), ('routed', profiles, True)]
+
+            self.stdout.write(
+                f"{'run':<14}{'reset p50 ms':>14}{'p95 ms':>10}{'max ms':>10}{'campaign s':>12}{'mails/s':>10}"
+            )
+            with override_settings(EMAIL_BACKEND='accounts.benchmarks.RecordingEmailBackend'):
+                for name, workers, campaign in runs:
+                    row = self.run(workers, campaign, options)
+                    self.stdout.write(
+                        f"{name:<14}{row['p50_ms']:>14.1f}{row['p95_ms']:>10.1f}{row['max_ms']:>10.1f}"
+                        f"{row['campaign_seconds'] or 0:>12.1f}{row['campaign_rate'] or 0:>10.0f}"
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, workers, campaign, options):
+        RecordingEmailBackend.sent = sent = {}
+        queued = {}
+        with run_workers(workers):
+            start = time.perf_counter()
+            if campaign:
+                tasks.send_reminders_task.delay('Task reminder', REMINDER_CONTEXT)
+            for i in range(options['resets']):
+                to = f'reset{i}@example.com'
+                queued[to] = time.perf_counter()
+                tasks.send_mail_task.delay('Restore password', 'restore_password_email', {'uri': 'http://x/'}, to)
+                time.sleep(options['interval'])
+
+            wait_for(lambda: all(to in sent for to in queued), options['timeout'])
+            expected = len(queued) + (options['recipients'] if campaign else 0)
+            wait_for(lambda: len(sent) >= expected, options['timeout'])
+
+        latencies = sorted(sent[to] - queued[to] for to in queued)
+        campaign_seconds = max(sent.values()) - start if campaign else None
+        return {
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'max_ms': latencies[-1] * 1000,
+            'campaign_seconds': campaign_seconds,
+            'campaign_rate': options['recipients'] / campaign_seconds if campaign else None,
+        }
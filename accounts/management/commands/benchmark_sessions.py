@@ -0,0 +1,128 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from accounts.benchmarks import percentile
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'accounts.session_backends.cache',
+    'cached_db': 'accounts.session_backends.cached_db',
+}
+
+
+def create(store_class, key, i):
+    session = store_class()
+    session['_auth_user_id'] = str(i)
+    session['_auth_user_backend'] = 'accounts.backends.EmailModelBackend'
+    session.save()
+    return session.session_key
+
+
+def read(store_class, key, i):
+    # A request that only reads the session: SessionMiddleware does not save it.
+    store_class(key).get('_auth_user_id')
+
+
+def touch(store_class, key, i):
+    # Assigned but unchanged, e.g. a view re-setting a preference: skipped by SkipUnchangedMixin.
+    session = store_class(key)
+    session['_auth_user_id'] = session['_auth_user_id']
+    session.save()
+
+
+def write(store_class, key, i):
+    session = store_class(key)
+    session['last_seen'] = i
+    session.save()
+
+
+OPERATIONS = {'create': create, 'read': read, 'touch': touch, 'write': write}
+
+
+class Command(BaseCommand):
+    help = 'Measure session create, read, touch (unchanged save) and write throughput per session engine: ' \
+           'db, cache and cached_db against the sessions cache, and the cache engines against Redis with ' \
+           '--redis. Run with DJANGO_SETTINGS_MODULE=core.settings_benchmark.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=1000, help='Sessions created before timing.')
+        parser.add_argument('--iterations', type=int, default=2000, help='Timed operations per engine.')
+        parser.add_argument('--redis', metavar='URL', help='Also run the cache engines against this Redis.')
+
+    def handle(self, *args, **options):
+        runs = [(name, engine, None) for name, engine in ENGINES.items()]
+        if options['redis']:
+            runs += [(f'{name}+redis', ENGINES[name], options['redis']) for name in ('cache', 'cached_db')]
+        else:
+            self.stderr.write(
+                f"No --redis URL, the cache engines use {settings.CACHES[settings.SESSION_CACHE_ALIAS]['BACKEND']}."
+            )
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"{'engine':<18}{'operation':<10}{'ops/s':>10}{'p50 us':>10}{'p95 us':>10}{'queries':>9}")
+            for name, engine, redis_url in runs:
+                with override_settings(SESSION_ENGINE=engine, CACHES=self.get_caches(redis_url, options)):
+                    try:
+                        caches[settings.SESSION_CACHE_ALIAS].get('benchmark-sessions')
+                    except Exception as exc:
+                        self.stderr.write(f'{name}: skipped, the sessions cache is unreachable: {exc}')
+                        continue
+                    for operation, row in self.run(engine, options).items():
+                        self.stdout.write(
+                            f"{name:<18}{operation:<10}{row['ops_per_sec']:>10.0f}{row['p50_us']:>10.1f}"
+                            f"{row['p95_us']:>10.1f}{row['queries']:>9.2f}"
+                        )
+                    caches[settings.SESSION_CACHE_ALIAS].clear()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    @staticmethod
+    def get_caches(redis_url, options):
+        if redis_url:
+            cache = {
+                'BACKEND': 'django_redis.cache.RedisCache',
+                'LOCATION': redis_url,
+                'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+            }
+        else:
+            # LocMemCache culls past 300 entries by default, which would turn cache reads into misses.
+            cache = settings.CACHES[settings.SESSION_CACHE_ALIAS]
+            max_entries = options['sessions'] + options['iterations'] + 1
+            cache = {**cache, 'OPTIONS': {**cache.get('OPTIONS', {}), 'MAX_ENTRIES': max_entries}}
+        return {**settings.CACHES, settings.SESSION_CACHE_ALIAS: cache}
+
+    @staticmethod
+    def run(engine, options):
+        store_class = import_module(engine).SessionStore
+        keys = [create(store_class, None, i) for i in range(options['sessions'])]
+        results = {}
+        for operation, function in OPERATIONS.items():
+            latencies, queries = [], []
+
+            def count(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count):
+                for i in range(options['iterations']):
+                    key = keys[i % len(keys)]
+                    start = time.perf_counter()
+                    function(store_class, key, i)
+                    latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            results[operation] = {
+                'ops_per_sec': len(latencies) / sum(latencies),
+                'p50_us': percentile(latencies, 50) * 1e6,
+                'p95_us': percentile(latencies, 95) * 1e6,
+                'queries': len(queries) / len(latencies),
+            }
+        return results
@@ -0,0 +1,42 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+
+from accounts import throttling
+from accounts.benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the throttling check for a token bucket backend.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', default=None, help='Dotted path of the bucket class, defaults to the setting.')
+        parser.add_argument('--scope', default='login')
+        parser.add_argument('--requests', type=int, default=10000)
+        parser.add_argument('--clients', type=int, default=1000, help='Distinct IPs/emails to spread requests over.')
+
+    def handle(self, *args, **options):
+        if options['backend']:
+            throttling._bucket = import_string(options['backend'])()
+
+        factory = RequestFactory()
+        requests = [
+            factory.post('/', {'email': f'user{i}@example.com'}, REMOTE_ADDR=f'10.0.{i // 256 % 256}.{i % 256}')
+            for i in range(options['clients'])
+        ]
+
+        latencies = []
+        for i in range(options['requests']):
+            request = requests[i % len(requests)]
+            start = time.perf_counter()
+            throttling.check(request, options['scope'])
+            latencies.append(time.perf_counter() - start)
+
+        latencies.sort()
+        self.stdout.write(
+            f"{type(throttling.get_bucket()).__name__}: mean={statistics.mean(latencies) * 1e6:.1f}us "
+            f"p50={percentile(latencies, 50) * 1e6:.1f}us p99={percentile(latencies, 99) * 1e6:.1f}us"
+        )
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.tasks import dispatch_outbox, retry_dead_outbox
+
+
+class Command(BaseCommand):
+    help = 'Drain the email outbox. Several dispatchers can run in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE)
+        parser.add_argument('--delivery', choices=['celery', 'smtp'], default=settings.EMAIL_OUTBOX_DELIVERY)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once drained.')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds to sleep when the outbox is empty.')
+        parser.add_argument('--retry-dead', action='store_true',
+                            help='First make rows that ran out of attempts due again.')
+
+    def handle(self, *args, **options):
+        if options['retry_dead']:
+            self.stdout.write(f'Retrying {retry_dead_outbox()} dead outbox rows.')
+        total = 0
+        while True:
+            claimed, failed = dispatch_outbox(options['batch_size'], options['delivery'])
+            total += claimed - failed
+            if failed or claimed < options['batch_size']:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(f'Dispatched {total} outbox rows.')
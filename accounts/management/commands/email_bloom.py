@@ -0,0 +1,53 @@
+import math
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import bloom
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Report on the registered-email filter: size, memory per million users and the false-positive rate ' \
+           'measured against never-registered emails. --rebuild rebuilds it from accounts_user first.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true')
+        parser.add_argument('--samples', type=int, default=100000, help='Unregistered emails to probe.')
+
+    def handle(self, *args, **options):
+        email_filter = bloom.get_filter()
+        if email_filter is None:
+            raise CommandError('ACCOUNT_EMAIL_BLOOM_BACKEND is not set.')
+
+        if options['rebuild']:
+            start = time.perf_counter()
+            count = email_filter.rebuild()
+            self.stdout.write(f'Rebuilt with {count} emails in {time.perf_counter() - start:.2f}s.')
+
+        users = User.objects.count()
+        samples = options['samples']
+        positives, unknown = 0, 0
+        start = time.perf_counter()
+        for _ in range(samples):
+            result = email_filter.contains(f'{uuid.uuid4().hex}@probe.invalid')
+            if result is None:
+                unknown += 1
+            elif result:
+                positives += 1
+        elapsed = time.perf_counter() - start
+        if unknown:
+            raise CommandError('The filter has not been built yet, run with --rebuild.')
+
+        expected = (1 - math.exp(-email_filter.hashes * users / email_filter.bits)) ** email_filter.hashes
+        per_million = email_filter.memory_bytes / settings.ACCOUNT_EMAIL_BLOOM_CAPACITY * 1e6
+        self.stdout.write(f'backend: {type(email_filter).__name__}')
+        self.stdout.write(f'users: {users} (capacity {settings.ACCOUNT_EMAIL_BLOOM_CAPACITY})')
+        self.stdout.write(f'bits: {email_filter.bits}, hashes: {email_filter.hashes}')
+        self.stdout.write(f'memory: {email_filter.memory_bytes / 2 ** 20:.2f} MiB, '
+                          f'{per_million / 2 ** 20:.2f} MiB per million users')
+        self.stdout.write(f'false positives: {positives}/{samples} = {positives / samples:.5f} '
+                          f'(expected {expected:.5f})')
+        self.stdout.write(f'lookup: {elapsed / samples * 1e6:.1f}us')
@@ -0,0 +1,38 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.exports import EXPORT_FORMATS, RENDERERS, get_export_queryset, iter_users, parse_bound
+
+
+class Command(BaseCommand):
+    help = 'Stream accounts.User rows with their social auth providers as CSV or JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help='Output file, defaults to stdout.')
+        parser.add_argument('--joined-after', help='ISO date/datetime, inclusive.')
+        parser.add_argument('--joined-before', help='ISO date/datetime, exclusive.')
+        parser.add_argument('--is-active', choices=['true', 'false'])
+        parser.add_argument('--provider', help='Only users linked to this social auth provider.')
+        parser.add_argument('--chunk-size', type=int, default=settings.ACCOUNT_EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            queryset = get_export_queryset(
+                joined_after=parse_bound(options['joined_after']),
+                joined_before=parse_bound(options['joined_before']),
+                is_active=None if options['is_active'] is None else options['is_active'] == 'true',
+                provider=options['provider'],
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in RENDERERS[options['format']](iter_users(queryset, chunk_size=options['chunk_size'])):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,144 @@
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Lower
+from social_django.models import UserSocialAuth
+
+from accounts import bloom
+from accounts.hashing import create_executor
+from accounts.models import User
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class Command(BaseCommand):
+    help = 'Stream users from a CSV or JSONL file into accounts.User in batches. Columns: email, and optionally ' \
+           'password (raw), password_hash (Django hasher format), first_name, last_name, is_active, provider, uid.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, '-' reads stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--hash-workers', type=int, default=0,
+                            help='Processes used to hash raw passwords, 0 hashes inline.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        executor = create_executor(options['hash_workers']) if options['hash_workers'] else None
+        self.stats = {'read': 0, 'created': 0, 'skipped': 0, 'invalid': 0, 'social': 0}
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        start = time.perf_counter()
+        try:
+            rows = self.read_rows(stream, file_format)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                self.import_batch(batch, executor)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"read={self.stats['read']} created={self.stats['created']} skipped={self.stats['skipped']} "
+                    f"invalid={self.stats['invalid']} social={self.stats['social']} "
+                    f"rows/s={self.stats['read'] / elapsed:.0f}"
+                )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if executor is not None:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.stats['created']} users in {time.perf_counter() - start:.1f}s."
+        ))
+
+    def read_rows(self, stream, file_format):
+        if file_format == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line_number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    raise CommandError(f'Invalid JSON on line {line_number}.')
+                if not isinstance(row, dict):
+                    raise CommandError(f'Line {line_number} is not a JSON object.')
+                yield row
+
+    def import_batch(self, batch, executor):
+        self.stats['read'] += len(batch)
+
+        rows = {}
+        for row in batch:
+            email = User.objects.normalize_email((row.get('email') or '').strip())
+            if not email:
+                self.stats['invalid'] += 1
+            elif email.lower() in rows:
+                self.stats['skipped'] += 1
+            else:
+                rows[email.lower()] = row
+
+        existing = set(
+            User.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=rows).values_list('email_lower', flat=True)
+        )
+        self.stats['skipped'] += len(existing)
+        rows = {key: row for key, row in rows.items() if key not in existing}
+
+        raw = [key for key, row in rows.items() if not row.get('password_hash')]
+        passwords = [rows[key].get('password') or None for key in raw]
+        if executor is not None:
+            hashed = executor.map(hashers.make_password, passwords, chunksize=max(1, len(passwords) // 16))
+        else:
+            hashed = map(hashers.make_password, passwords)
+        for key, encoded in zip(raw, hashed):
+            rows[key]['password_hash'] = encoded
+
+        users = []
+        for key, row in rows.items():
+            if hashers.is_password_usable(row['password_hash']):
+                try:
+                    hashers.identify_hasher(row['password_hash'])
+                except ValueError:
+                    self.stats['invalid'] += 1
+                    continue
+            users.append(User(
+                email=User.objects.normalize_email(row['email'].strip()),
+                password=row['password_hash'],
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                is_active=str(row.get('is_active', 'true')).strip().lower() in TRUE_VALUES,
+            ))
+
+        with transaction.atomic():
+            User.objects.bulk_create(users, ignore_conflicts=True)
+            # ignore_conflicts returns no ids and skips rows created since the lookup above. The password
+            # hashes are salted, so a row holding the hash built here is one this batch inserted.
+            passwords = {user.email.lower(): user.password for user in users}
+            ids = {
+                key: pk for key, pk, password in
+                User.objects.annotate(email_lower=Lower('email'))
+                .filter(email_lower__in=passwords).values_list('email_lower', 'id', 'password')
+                if passwords[key] == password
+            }
+            self.stats['created'] += len(ids)
+            self.stats['skipped'] += len(users) - len(ids)
+            # bulk_create sends no post_save, add the new emails to the registered-email filter here.
+            bloom.add(*(user.email for user in users if user.email.lower() in ids))
+
+            links = [
+                UserSocialAuth(user_id=ids[key], provider=rows[key]['provider'], uid=str(rows[key]['uid']),
+                               extra_data={})
+                for key in ids if rows[key].get('provider') and rows[key].get('uid')
+            ]
+            if links:
+                UserSocialAuth.objects.bulk_create(links, ignore_conflicts=True)
+                self.stats['social'] += UserSocialAuth.objects.filter(user_id__in=ids.values()).count()
@@ -0,0 +1,87 @@
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand
+
+from accounts.benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = 'Load test a running server at increasing concurrency, e.g. to compare gunicorn (WSGI) against ' \
+           'uvicorn (core.asgi) on the same URL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='e.g. http://127.0.0.1:8000/accounts/login/')
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--data', action='append', default=[], help='Form field as key=value, repeatable.')
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 10, 50, 100, 200])
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per concurrency level.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        body = urlencode(dict(item.split('=', 1) for item in options['data'])) if options['data'] else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+        target = (url.hostname, url.port or 80, url.path + (f'?{url.query}' if url.query else ''))
+
+        results = [
+            self.run_level(target, options['method'], body, headers, concurrency, options['duration'])
+            for concurrency in options['concurrency']
+        ]
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for row in results:
+            self.stdout.write(
+                f"{row['concurrency']:>6}{row['requests_per_sec']:>10.1f}{row['p50_ms']:>10.1f}"
+                f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['errors']:>8}"
+            )
+
+    def run_level(self, target, method, body, headers, concurrency, duration):
+        host, port, path = target
+        latencies, errors = [], []
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + duration
+
+        def worker():
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            own_latencies, own_errors = [], 0
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    connection.request(method, path, body=body, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status >= 500:
+                        own_errors += 1
+                except (OSError, http.client.HTTPException):
+                    own_errors += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection(host, port, timeout=30)
+                    continue
+                own_latencies.append(time.perf_counter() - start)
+            connection.close()
+            with lock:
+                latencies.extend(own_latencies)
+                errors.append(own_errors)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        latencies.sort()
+        return {
+            'concurrency': concurrency,
+            'requests_per_sec': len(latencies) / duration,
+            'p50_ms': percentile(latencies, 50) * 1000 if latencies else 0.0,
+            'p95_ms': percentile(latencies, 95) * 1000 if latencies else 0.0,
+            'p99_ms': percentile(latencies, 99) * 1000 if latencies else 0.0,
+            'errors': sum(errors),
+        }
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class SMTPSink:
+    """
+    Minimal SMTP server that accepts and discards every mail, used to benchmark delivery offline.
+    """
+
+    def __init__(self):
+        self.messages = 0
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        writer.write(b'220 smtp-sink ready\r\n')
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line[:4].upper()
+            if command == b'EHLO':
+                writer.write(b'250-smtp-sink\r\n250 8BITMIME\r\n')
+            elif command == b'DATA':
+                writer.write(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+                await writer.drain()
+                while (await reader.readline()) not in (b'.\r\n', b''):
+                    pass
+                self.messages += 1
+                writer.write(b'250 OK\r\n')
+            elif command == b'QUIT':
+                writer.write(b'221 Bye\r\n')
+                await writer.drain()
+                break
+            elif command == b'STAR':
+                writer.write(b'454 TLS not available\r\n')
+            else:
+                writer.write(b'250 OK\r\n')
+            await writer.drain()
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = 'Run a local SMTP sink and report received messages/sec. Point EMAIL_HOST/EMAIL_PORT at it ' \
+           'with EMAIL_USE_TLS=False.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between throughput reports.')
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(self.serve(options['host'], options['port'], options['interval']))
+        except KeyboardInterrupt:
+            pass
+
+    async def serve(self, host, port, interval):
+        sink = SMTPSink()
+        server = await asyncio.start_server(sink.handle, host, port)
+        self.stdout.write(f'SMTP sink listening on {host}:{port}')
+        async with server:
+            last_count, last_time = 0, time.perf_counter()
+            while True:
+                await asyncio.sleep(interval)
+                now = time.perf_counter()
+                rate = (sink.messages - last_count) / (now - last_time)
+                self.stdout.write(f'messages={sink.messages} connections={sink.connections} rate={rate:.1f}/s')
+                last_count, last_time = sink.messages, now
@@ -1,10 +1,31 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db.models.functions import Lower
 from django.utils.translation import gettext_lazy as _
 
+from . import bloom
+
+
+AUTH_FIELDS = ('id', 'email', 'password', 'is_active', 'last_login')
+
 
 class UserManager(BaseUserManager):
     use_in_migrations = True
 
+    def filter_by_email(self, email):
+        """
+        Case-insensitive email lookup backed by the unique index on lower(email).
+        """
+        return self.annotate(email_lower=Lower('email')).filter(email_lower=(email or '').lower())
+
+    def get_for_auth(self, email):
+        """
+        Return the user for the given email with only the columns needed to authenticate, or None.
+        Emails the registered-email filter has never seen are rejected without a query.
+        """
+        if not bloom.might_exist(email):
+            return None
+        return self.filter_by_email(email).only(*AUTH_FIELDS).first()
+
     def create_user(self, email, password=None, **extra_fields):
         """
         Create and save a User with the given email and password.
@@ -0,0 +1,64 @@
+import ipaddress
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotFound
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, \
+    generate_latest, multiprocess
+
+# Metrics are kept per process. With PROMETHEUS_MULTIPROC_DIR set (before the first import of prometheus_client)
+# every gunicorn worker and Celery process writes them to mmapped files in that directory and the /metrics view
+# aggregates the files, so a scrape never touches the database or the other workers.
+
+LOGINS = Counter('accounts_logins_total', 'Password logins by outcome.', ['outcome'])
+REQUEST_DURATION = Histogram('accounts_request_duration_seconds', 'Request latency by URL name.', ['view'])
+PASSWORD_HASH_DURATION = Histogram(
+    'accounts_password_hash_duration_seconds', 'Password hashing and verification time.', ['operation'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 2, 5),
+)
+ACTIVATIONS = Counter('accounts_activations_total', 'Activation codes issued and accounts activated.', ['event'])
+PASSWORD_RESETS = Counter('accounts_password_resets_total', 'Password reset links sent and used.', ['event'])
+EMAIL_QUEUE_DEPTH = Gauge(
+    'accounts_email_queue_depth',
+    'Mails waiting in the outbox or the batch queue, or out of attempts in the outbox, as last seen by a worker.',
+    ['queue'], multiprocess_mode='mostrecent',
+)
+EMAILS_SENT = Counter(
+    'accounts_emails_sent_total', 'Mails handed to the SMTP server or dropped as duplicates, by outcome.', ['outcome'],
+)
+EMAIL_SEND_DURATION = Histogram('accounts_email_send_duration_seconds', 'Time to render and send one mail.')
+USER_CACHE_REQUESTS = Counter(
+    'accounts_user_cache_requests_total', 'request.user lookups by result: local_hit, hit or miss.', ['result'],
+)
+EMAIL_BLOOM_CHECKS = Counter(
+    'accounts_email_bloom_checks_total', 'Email filter lookups: negative, positive or unknown (not built).', ['result'],
+)
+SOCIAL_AUTH = Counter('accounts_social_auth_total', 'Social auth pipeline outcomes.', ['provider', 'outcome'])
+
+
+def is_allowed_scraper(request):
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def metrics(request):
+    # Not public: answer as if the URL did not exist to anyone outside METRICS_ALLOWED_NETWORKS.
+    if not is_allowed_scraper(request):
+        return HttpResponseNotFound()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def child_exit(server, worker):
+    """
+    Drop a dead worker's files, call it from the child_exit hook of the gunicorn config.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
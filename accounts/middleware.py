@@ -1,12 +1,101 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
 from django.shortcuts import redirect
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.functional import SimpleLazyObject
 from social_django.middleware import SocialAuthExceptionMiddleware
-from social_core.exceptions import AuthAlreadyAssociated
+from social_core.exceptions import AuthAlreadyAssociated, SocialAuthBaseException
+
+from . import instrumentation, user_cache
+from .metrics import REQUEST_DURATION, SOCIAL_AUTH
+
+logger = logging.getLogger('accounts.requests')
 
 
 class CustomSocialAuthExceptionMiddleware(SocialAuthExceptionMiddleware):
 
     def process_exception(self, request, exception):
+        backend = getattr(request, 'backend', None)
+        if backend is not None and isinstance(exception, SocialAuthBaseException):
+            outcome = 'already_associated' if isinstance(exception, AuthAlreadyAssociated) else 'error'
+            SOCIAL_AUTH.labels(backend.name, outcome).inc()
         if isinstance(exception, AuthAlreadyAssociated):
             url = self.get_redirect_uri(request, exception)
             return redirect(url)
         return super(CustomSocialAuthExceptionMiddleware, self).process_exception(request, exception)
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = user_cache.get_user(request)
+    return request._cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware with request.user loaded through accounts.user_cache, saving the user query on
+    authenticated requests.
+    """
+
+    def process_request(self, request):
+        super(CachedAuthenticationMiddleware, self).process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+def get_query_budget(request):
+    match = request.resolver_match
+    if match is None:
+        return None, None
+    view = getattr(match.func, 'view_class', match.func)
+    return match.view_name, getattr(view, 'query_budget', None)
+
+
+def finish_request(request, response, timings):
+    total = timings.elapsed()
+    response['Server-Timing'] = timings.server_timing(total)
+
+    view_name, budget = get_query_budget(request)
+    if view_name is not None:
+        REQUEST_DURATION.labels(view_name).observe(total)
+    fields = timings.as_log_fields(total)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            '%s %s %s %.1fms %d queries', request.method, request.path, response.status_code, fields['total_ms'],
+            fields['db_queries'],
+            extra={'method': request.method, 'path': request.path, 'view': view_name, 'status': response.status_code,
+                   **fields},
+        )
+    if budget is not None and fields['db_queries'] > budget:
+        message = f'{view_name} ran {fields["db_queries"]} queries, its budget is {budget}.'
+        if settings.ACCOUNT_QUERY_BUDGETS_STRICT:
+            raise instrumentation.QueryBudgetExceeded(message)
+        logger.warning(message, extra={'view': view_name, 'db_queries': fields['db_queries'], 'budget': budget})
+    return response
+
+
+@sync_and_async_middleware
+def RequestTimingMiddleware(get_response):
+    """
+    Record DB, cache, password hashing, template and mail enqueue time for each request, send it back as a
+    Server-Timing header, log it on the 'accounts.requests' logger and check the view's ``query_budget``.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            timings, token = instrumentation.begin()
+            try:
+                response = await get_response(request)
+            finally:
+                instrumentation.end(token)
+            return finish_request(request, response, timings)
+    else:
+        def middleware(request):
+            timings, token = instrumentation.begin()
+            try:
+                response = get_response(request)
+            finally:
+                instrumentation.end(token)
+            return finish_request(request, response, timings)
+    return middleware
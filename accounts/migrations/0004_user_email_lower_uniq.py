@@ -0,0 +1,79 @@
+# Generated by Django 4.1.13 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.functions.text
+
+CONSTRAINT_NAME = 'accounts_user_email_lower_uniq'
+
+
+def check_case_duplicates(apps, schema_editor):
+    # The index cannot be built while two users share an email up to case. List them so they can be merged
+    # or renamed before migrating again, rather than failing halfway through the build.
+    User = apps.get_model('accounts', 'User')
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias)
+        .annotate(email_lower=django.db.models.functions.text.Lower('email'))
+        .values('email_lower').annotate(users=Count('id')).filter(users__gt=1)
+        .order_by('email_lower').values_list('email_lower', 'users')[:50]
+    )
+    if duplicates:
+        listed = ', '.join(f'{email} ({users} users)' for email, users in duplicates)
+        raise RuntimeError(
+            f'Cannot add {CONSTRAINT_NAME}: these emails belong to more than one user once lowercased: {listed}. '
+            f'Merge or rename those accounts, then run the migration again.'
+        )
+
+
+def create_index(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    constraint = models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name=CONSTRAINT_NAME)
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.add_constraint(User, constraint)
+        return
+    # Built without locking writes to accounts_user. A build that failed earlier leaves an invalid index
+    # behind, drop it first so IF NOT EXISTS does not keep it.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)', [CONSTRAINT_NAME],
+        )
+        row = cursor.fetchone()
+    if row and row[0]:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{CONSTRAINT_NAME}"')
+    schema_editor.execute(
+        f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{CONSTRAINT_NAME}" ON "accounts_user" ((LOWER("email")))'
+    )
+
+
+def drop_index(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.remove_constraint(
+            User, models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name=CONSTRAINT_NAME),
+        )
+        return
+    schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{CONSTRAINT_NAME}"')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0003_alter_activation_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_duplicates, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(create_index, drop_index)],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='user',
+                    constraint=models.UniqueConstraint(
+                        django.db.models.functions.text.Lower('email'), name=CONSTRAINT_NAME,
+                    ),
+                ),
+            ],
+        ),
+    ]
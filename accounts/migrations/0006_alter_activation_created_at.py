@@ -0,0 +1,18 @@
+# Generated by Django 4.0 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activation',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
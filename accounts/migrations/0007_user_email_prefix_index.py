@@ -0,0 +1,37 @@
+from django.contrib.postgres.indexes import OpClass
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+INDEX_NAME = 'accounts_user_email_prefix_idx'
+
+
+def get_index():
+    return models.Index(OpClass(Lower('email'), name='text_pattern_ops'), name=INDEX_NAME)
+
+
+def create_index(apps, schema_editor):
+    # text_pattern_ops is PostgreSQL only, other databases fall back to a scan for admin search.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('accounts', 'User'), get_index(), concurrently=True)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('accounts', 'User'), get_index(), concurrently=True)
+
+
+class Migration(migrations.Migration):
+    # Built with CREATE INDEX CONCURRENTLY, which cannot run inside a transaction, so writes to accounts_user
+    # are not blocked while it runs.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0006_alter_activation_created_at'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(create_index, drop_index)],
+            state_operations=[migrations.AddIndex(model_name='user', index=get_index())],
+        ),
+    ]
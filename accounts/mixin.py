@@ -1,5 +1,9 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.mixins import AccessMixin
-from django.http import HttpResponseBadRequest
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
+
+from core.constants import ACCOUNT_THROTTLED
+from . import throttling
 
 
 class LoginRequiredForApiMixin(AccessMixin):
@@ -8,3 +12,49 @@ class LoginRequiredForApiMixin(AccessMixin):
         if not request.user.is_authenticated:
             return HttpResponseBadRequest()
         return super().dispatch(request, *args, **kwargs)
+
+
+class StaffRequiredForApiMixin(AccessMixin):
+    """Verify that the current user is an authenticated staff member."""
+    def dispatch(self, request, *args, **kwargs):
+        if not (request.user.is_authenticated and request.user.is_staff):
+            return HttpResponseForbidden()
+        return super().dispatch(request, *args, **kwargs)
+
+
+class AsyncLoginRequiredForApiMixin(AccessMixin):
+    """Verify that the current user is authenticated, for views with async handlers."""
+    async def dispatch(self, request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return HttpResponseBadRequest()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+def throttled_response(retry_after):
+    response = JsonResponse({'error': ACCOUNT_THROTTLED}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class ThrottleMixin:
+    """Reject POST requests over the ``throttle_scope`` rate before any form validation runs."""
+    throttle_scope = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method == 'POST' and self.throttle_scope:
+            retry_after = throttling.check(request, self.throttle_scope)
+            if retry_after:
+                return throttled_response(retry_after)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class AsyncThrottleMixin:
+    """ThrottleMixin for views with async handlers, the Redis call runs off the event loop."""
+    throttle_scope = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method == 'POST' and self.throttle_scope:
+            retry_after = await sync_to_async(throttling.check, thread_sensitive=False)(request, self.throttle_scope)
+            if retry_after:
+                return throttled_response(retry_after)
+        return await super().dispatch(request, *args, **kwargs)
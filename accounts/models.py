@@ -1,12 +1,22 @@
-import os
 import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import is_password_usable
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import OpClass
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from . import bloom, hashing
 from .managers import UserManager
+from .metrics import ACTIVATIONS
+from .tokens import activation_token_generator
 import datetime
 
+AccountState = namedtuple('AccountState', ['exists', 'is_active', 'has_usable_password'])
+
 
 class User(AbstractUser):
     username = None
@@ -17,19 +27,72 @@ class User(AbstractUser):
 
     objects = UserManager()
 
-    @classmethod
-    def get_user_emails(cls):
-        return User.objects.values_list('email', flat=True)
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            models.UniqueConstraint(Lower('email'), name='accounts_user_email_lower_uniq'),
+        ]
+        indexes = [
+            # Prefix search on lower(email) in the admin. Created on PostgreSQL only, see migration 0007.
+            models.Index(OpClass(Lower('email'), name='text_pattern_ops'), name='accounts_user_email_prefix_idx'),
+        ]
 
     @classmethod
-    def is_active_user(cls, email):
-        return User.objects.filter(email=email, is_active=True).exists()
+    def get_account_state(cls, email):
+        """
+        Return the AccountState for the given email using one indexed lookup on lower(email). Emails the
+        registered-email filter rules out get a non-existent state without a query.
+        """
+        if not bloom.might_exist(email):
+            return AccountState(exists=False, is_active=False, has_usable_password=False)
+        row = User.objects.filter_by_email(email).values_list('is_active', 'password').first()
+        if row is None:
+            return AccountState(exists=False, is_active=False, has_usable_password=False)
+        is_active, password = row
+        return AccountState(exists=True, is_active=is_active, has_usable_password=is_password_usable(password))
+
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        if hashing.check_password(self, raw_password):
+            self._password = None
+            return True
+        return False
 
     @classmethod
-    def is_inactive_user(cls, email):
-        return User.objects.filter(email=email, is_active=False).exists()
-
-    def get_activation_code(self):
+    def activate_with_token(cls, token):
+        """
+        Activate the user a signed activation token was issued for with one conditional UPDATE.
+        Returns False if the token is invalid, expired, or the user changed since it was issued.
+        """
+        claims = activation_token_generator.check_token(token)
+        if claims is None:
+            return False
+        user_id, last_login = claims
+        if User.objects.filter(pk=user_id, is_active=False, last_login=last_login).update(is_active=True) != 1:
+            return False
+        ACTIVATIONS.labels('completed').inc()
+        return True
+
+    def get_activation_code(self, reuse=False):
+        """
+        Return a new activation code, or with ``reuse`` the newest stored one issued less than
+        ACCOUNT_ACTIVATION_REUSE_WINDOW seconds ago, so a resend does not write a row.
+        """
+        if settings.ACCOUNT_ACTIVATION_MODE == 'signed':
+            ACTIVATIONS.labels('issued').inc()
+            return activation_token_generator.make_token(self)
+
+        if reuse and settings.ACCOUNT_ACTIVATION_REUSE_WINDOW > 0:
+            since = timezone.now() - datetime.timedelta(seconds=settings.ACCOUNT_ACTIVATION_REUSE_WINDOW)
+            code = (Activation.objects.filter(user=self, created_at__gte=since)
+                    .order_by('-created_at').values_list('code', flat=True).first())
+            if code is not None:
+                ACTIVATIONS.labels('reused').inc()
+                return code
+
+        ACTIVATIONS.labels('issued').inc()
         code = uuid.uuid4()
 
         act = Activation()
@@ -45,13 +108,12 @@ class User(AbstractUser):
 
 class Activation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     code = models.CharField(max_length=36, unique=True)
     email = models.EmailField(blank=True)
 
     def is_valid(self):
-        buffer = int(os.environ.get('BUFFER_TIME', '3600'))
-        if (self.created_at + datetime.timedelta(seconds=buffer)) >= timezone.now():
+        if (self.created_at + datetime.timedelta(seconds=settings.BUFFER_TIME)) >= timezone.now():
             return True
         return False
 
@@ -61,3 +123,17 @@ class Activation(models.Model):
         user.save()
 
         Activation.objects.filter(user=self.user).delete()
+        ACTIVATIONS.labels('completed').inc()
+
+
+class EmailOutbox(models.Model):
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    template = models.CharField(max_length=100)
+    context = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    # Rows that failed are retried with exponential backoff, NULL means due now.
+    next_attempt_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Unique while the row is pending, so a second copy of the same mail is not queued.
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
@@ -0,0 +1,76 @@
+from .metrics import SOCIAL_AUTH
+from .social import invalidate_social_connections
+
+# Refreshed by social_core on every login, not worth a write on its own.
+VOLATILE_EXTRA_DATA = ('auth_time',)
+DEFAULT_PROTECTED_USER_FIELDS = ('username', 'id', 'pk', 'email', 'password', 'is_active', 'is_staff', 'is_superuser')
+
+
+def invalidate_social_connections_cache(user=None, *args, **kwargs):
+    """
+    Drop the cached social connections after a social account is associated or disconnected.
+    """
+    if user:
+        invalidate_social_connections(user)
+
+
+def load_extra_data(backend, details, response, uid, user, *args, **kwargs):
+    """
+    Replacement for social_core.pipeline.social_auth.load_extra_data that only saves extra_data when a value
+    other than auth_time changed, and then only that column.
+    """
+    social = kwargs.get('social') or backend.strategy.storage.user.get_social_auth(backend.name, uid)
+    if not social:
+        return
+
+    extra_data = backend.extra_data(user, uid, response, details, *args, **kwargs)
+    stored = social.extra_data if isinstance(social.extra_data, dict) else {}
+    changed = not stored or any(
+        stored.get(key) != value for key, value in extra_data.items() if key not in VOLATILE_EXTRA_DATA
+    )
+    social.extra_data = {**stored, **extra_data}
+    if changed:
+        social.save(update_fields=['extra_data'])
+
+
+def user_details(strategy, details, backend, user=None, *args, **kwargs):
+    """
+    Replacement for social_core.pipeline.user.user_details that saves only the user fields the provider changed.
+    Honours the same PROTECTED_USER_FIELDS, USER_FIELD_MAPPING and IMMUTABLE_USER_FIELDS settings.
+    """
+    if not user:
+        return
+
+    protected = () if strategy.setting('NO_DEFAULT_PROTECTED_USER_FIELDS') is True else DEFAULT_PROTECTED_USER_FIELDS
+    protected += tuple(strategy.setting('PROTECTED_USER_FIELDS', []))
+    immutable = tuple(strategy.setting('IMMUTABLE_USER_FIELDS', []))
+    field_mapping = strategy.setting('USER_FIELD_MAPPING', {}, backend)
+    # Only concrete columns can be written with update_fields (User.username is None, fullname is not a field).
+    concrete = {field.attname for field in user._meta.concrete_fields}
+
+    changed = []
+    for name, value in details.items():
+        name = field_mapping.get(name, name)
+        if value is None or name not in concrete or name in protected:
+            continue
+        current = getattr(user, name)
+        if current == value or (name in immutable and current):
+            continue
+        setattr(user, name, value)
+        changed.append(name)
+
+    if changed:
+        user.save(update_fields=changed)
+
+
+def record_social_auth(backend, user=None, is_new=False, new_association=False, *args, **kwargs):
+    """
+    Count the pipeline outcome per provider: a new account, a new association or a returning login.
+    """
+    if is_new:
+        outcome = 'signup'
+    elif new_association:
+        outcome = 'associated'
+    else:
+        outcome = 'login'
+    SOCIAL_AUTH.labels(backend.name, outcome).inc()
@@ -0,0 +1,21 @@
+class SkipUnchangedMixin:
+    """
+    Skip the write when a session marked as modified serializes to the same payload it was loaded with.
+    The payload is compared rather than the dict, so nested values changed in place are still saved.
+    """
+
+    def snapshot(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = super().load()
+        self._saved_session = self.snapshot(data)
+        return data
+
+    def save(self, must_create=False):
+        session = getattr(self, '_session_cache', None)
+        if (not must_create and self.session_key and session is not None
+                and self.snapshot(session) == getattr(self, '_saved_session', None)):
+            return
+        super().save(must_create)
+        self._saved_session = self.snapshot(self._get_session())
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import cached_db
+
+from .base import SkipUnchangedMixin
+
+
+class SessionStore(SkipUnchangedMixin, cached_db.SessionStore):
+    pass
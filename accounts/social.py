@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.cache import cache
+from social_core.backends.utils import load_backends
+from social_django.models import UserSocialAuth
+
+from core.constants import ACCOUNT_SOCIAL_AUTH_PROVIDER_LABELS
+from .instrumentation import record_cache
+
+SOCIAL_CONNECTIONS_CACHE_KEY = 'accounts:social-connections:{}'
+
+
+def get_providers():
+    """
+    Social auth providers enabled in AUTHENTICATION_BACKENDS, as (name, label) pairs.
+    """
+    return [
+        (name, ACCOUNT_SOCIAL_AUTH_PROVIDER_LABELS.get(name, name.title()))
+        for name in load_backends(settings.AUTHENTICATION_BACKENDS)
+    ]
+
+
+def get_social_connections(user):
+    """
+    Return the user's (provider, uid) social auth pairs, loaded with one query and cached per user.
+    """
+    key = SOCIAL_CONNECTIONS_CACHE_KEY.format(user.pk)
+    connections = cache.get(key)
+    record_cache(connections is not None)
+    if connections is None:
+        connections = list(UserSocialAuth.objects.filter(user=user).values_list('provider', 'uid'))
+        cache.set(key, connections, settings.SOCIAL_CONNECTIONS_CACHE_TIMEOUT)
+    return connections
+
+
+def invalidate_social_connections(user):
+    cache.delete(SOCIAL_CONNECTIONS_CACHE_KEY.format(user.pk))
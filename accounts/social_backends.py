@@ -0,0 +1,71 @@
+from urllib.parse import urljoin
+
+from django.conf import settings
+from social_core.backends import facebook, github, google, instagram, twitter
+from social_core.backends.oauth import BaseOAuth2
+
+from .transport import PooledTransportMixin
+
+# The social_core backends listed in AUTHENTICATION_BACKENDS, with their HTTP calls sent through the pooled
+# sessions in accounts.transport. Names are unchanged, so existing UserSocialAuth rows, URLs and
+# SOCIAL_AUTH_<NAME>_* settings keep working.
+
+
+class GithubOAuth2(PooledTransportMixin, github.GithubOAuth2):
+    pass
+
+
+class TwitterOAuth(PooledTransportMixin, twitter.TwitterOAuth):
+    pass
+
+
+class FacebookOAuth2(PooledTransportMixin, facebook.FacebookOAuth2):
+    pass
+
+
+class GoogleOAuth2(PooledTransportMixin, google.GoogleOAuth2):
+    pass
+
+
+class InstagramOAuth2(PooledTransportMixin, instagram.InstagramOAuth2):
+    pass
+
+
+class StubOAuth2(PooledTransportMixin, BaseOAuth2):
+    """
+    OAuth2 backend for the local stub provider in accounts.stub_provider, used to run the full OAuth round trip
+    in benchmarks and tests without a real provider. Pick the account with /oauth/login/stub/?login_hint=<name>.
+    """
+
+    name = 'stub'
+    ACCESS_TOKEN_METHOD = 'POST'
+    REDIRECT_STATE = False
+    STATE_PARAMETER = True
+    EXTRA_DATA = [
+        ('id', 'id'),
+        ('login', 'login'),
+    ]
+
+    def authorization_url(self):
+        return urljoin(settings.SOCIAL_AUTH_STUB_BASE_URL, 'authorize/')
+
+    def access_token_url(self):
+        return urljoin(settings.SOCIAL_AUTH_STUB_BASE_URL, 'token/')
+
+    def auth_extra_arguments(self):
+        arguments = super().auth_extra_arguments()
+        if 'login_hint' in self.data:
+            arguments['login_hint'] = self.data['login_hint']
+        return arguments
+
+    def get_user_details(self, response):
+        return {
+            'username': response['login'],
+            'email': response['email'],
+            'first_name': response['login'].title(),
+            'last_name': 'Stub',
+        }
+
+    def user_data(self, access_token, *args, **kwargs):
+        return self.get_json(urljoin(settings.SOCIAL_AUTH_STUB_BASE_URL, 'user/'),
+                             headers={'Authorization': f'Bearer {access_token}'})
@@ -0,0 +1,54 @@
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import redirect
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+# A minimal OAuth2 provider for accounts.social_backends.StubOAuth2, mounted at /oauth-stub/ when
+# SOCIAL_AUTH_STUB_ENABLED is on. The code and access token are derived from the login hint, so no state is
+# kept. SOCIAL_AUTH_STUB_LATENCY adds a delay to the token and profile calls to mimic a remote provider.
+
+TOKEN_PREFIX = 'stub-'
+
+
+def simulate_latency():
+    if settings.SOCIAL_AUTH_STUB_LATENCY:
+        time.sleep(settings.SOCIAL_AUTH_STUB_LATENCY)
+
+
+def authorize(request):
+    redirect_uri = request.GET.get('redirect_uri')
+    if not redirect_uri:
+        return HttpResponseBadRequest('redirect_uri is required.')
+    params = {'code': request.GET.get('login_hint') or 'stub-user', 'state': request.GET.get('state', '')}
+    return redirect(f'{redirect_uri}{"&" if "?" in redirect_uri else "?"}{urlencode(params)}')
+
+
+@csrf_exempt
+@require_POST
+def token(request):
+    simulate_latency()
+    code = request.POST.get('code')
+    if not code:
+        return JsonResponse({'error': 'invalid_grant'}, status=400)
+    return JsonResponse({'access_token': TOKEN_PREFIX + code, 'token_type': 'bearer'})
+
+
+def user(request):
+    simulate_latency()
+    scheme, _, access_token = request.headers.get('Authorization', '').partition(' ')
+    if scheme != 'Bearer' or not access_token.startswith(TOKEN_PREFIX):
+        return JsonResponse({'error': 'invalid_token'}, status=401)
+    login = access_token[len(TOKEN_PREFIX):]
+    return JsonResponse({'id': login, 'login': login, 'email': f'{login}@stub.example.com'})
+
+
+urlpatterns = [
+    path('authorize/', authorize, name='stub-authorize'),
+    path('token/', token, name='stub-token'),
+    path('user/', user, name='stub-user'),
+]
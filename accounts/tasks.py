@@ -1,11 +1,261 @@
 # todo/tasks.py
+import datetime
+import logging
+import time
+from collections import namedtuple
+from itertools import groupby, islice
 
 from celery import shared_task
-from django.core.mail import EmailMessage
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import bloom, mail
+from .metrics import EMAIL_QUEUE_DEPTH, EMAIL_SEND_DURATION, EMAILS_SENT
+from .models import Activation, EmailOutbox, User
+
+logger = logging.getLogger(__name__)
+
+DispatchResult = namedtuple('DispatchResult', ['claimed', 'failed'])
+
+
+@shared_task(bind=True, max_retries=settings.EMAIL_SEND_MAX_RETRIES, default_retry_delay=settings.EMAIL_SEND_RETRY_DELAY)
+def send_mail_task(self, subject, template, context, to, idempotency_key=None):
+    # Only the first attempt claims the key, retries of a claimed mail must still go out.
+    if self.request.retries == 0 and not mail.claim(idempotency_key):
+        return
+
+    if settings.EMAIL_BATCH_SIZE <= 1:
+        deliver_mail(self, subject, template, context, to)
+        return
+
+    if mail.enqueue(subject, template, context, to) >= settings.EMAIL_BATCH_SIZE:
+        flush_mail_queue_task.delay()
+    elif mail.schedule_flush():
+        flush_mail_queue_task.apply_async(countdown=settings.EMAIL_BATCH_WINDOW)
+
+
+@shared_task()
+def flush_mail_queue_task():
+    mail.clear_flush()
+    if mail.recover():
+        logger.warning('Requeued mail batches left in flight by a worker that stopped')
+    EMAIL_QUEUE_DEPTH.labels('batch').set(mail.queue_length())
+    while True:
+        batch, payloads = mail.drain(settings.EMAIL_BATCH_SIZE)
+        if not payloads:
+            break
+        try:
+            messages = [mail.build_message(**payload) for payload in payloads]
+            failed = mail.send_batch(messages)
+            for payload, message in zip(payloads, messages):
+                if message in failed:
+                    deliver_mail_task.delay(**payload)
+        except Exception:
+            # Delivery is at least once: a mail already sent from this batch may go out again.
+            mail.requeue(batch)
+            raise
+        mail.ack(batch)
+
+
+@shared_task(bind=True, max_retries=settings.EMAIL_SEND_MAX_RETRIES, default_retry_delay=settings.EMAIL_SEND_RETRY_DELAY)
+def deliver_mail_task(self, subject, template, context, to):
+    deliver_mail(self, subject, template, context, to)
+
+
+def deliver_mail(task, subject, template, context, to):
+    try:
+        with EMAIL_SEND_DURATION.time():
+            mail.build_message(subject, template, context, to).send()
+    except Exception as exc:
+        EMAILS_SENT.labels('failure').inc()
+        raise task.retry(exc=exc)
+    EMAILS_SENT.labels('success').inc()
+
+
+@shared_task()
+def send_reminders_task(subject, context, template='task_reminder', chunk_size=None):
+    """
+    Mail ``template`` to every active user. Recipients are streamed from accounts_user in chunks of ``chunk_size``
+    and each chunk is handed to a send_reminder_batch_task, which sends it over one SMTP connection.
+    """
+    chunk_size = chunk_size or settings.EMAIL_BULK_CHUNK_SIZE
+    emails = User.objects.filter(is_active=True).values_list('email', flat=True).iterator(chunk_size=chunk_size)
+    start = time.perf_counter()
+    recipients = batches = 0
+    while True:
+        chunk = list(islice(emails, chunk_size))
+        if not chunk:
+            break
+        send_reminder_batch_task.delay(subject, template, context, chunk)
+        recipients += len(chunk)
+        batches += 1
+    elapsed = time.perf_counter() - start
+    logger.info('Queued %d reminders in %d batches in %.2fs', recipients, batches, elapsed,
+                extra={'recipients': recipients, 'batches': batches, 'seconds': elapsed})
+    return {'recipients': recipients, 'batches': batches, 'seconds': elapsed}
+
+
+@shared_task(bind=True, max_retries=settings.EMAIL_SEND_MAX_RETRIES, default_retry_delay=settings.EMAIL_SEND_RETRY_DELAY)
+def send_reminder_batch_task(self, subject, template, context, recipients):
+    failed = mail.send_batch(mail.build_messages(subject, template, context, recipients))
+    if failed:
+        # Only the recipients that failed are tried again.
+        raise self.retry(args=(subject, template, context, [message.to[0] for message in failed]))
+    return len(recipients)
 
 
 @shared_task()
-def send_mail_task(subject, html_content, to):
-    msg = EmailMessage(subject, html_content, to=[to])
-    msg.send()
+def dispatch_outbox_task():
+    # The depth is sampled here, on the beat schedule, so scraping /metrics never queries the outbox.
+    EMAIL_QUEUE_DEPTH.labels('outbox').set(
+        EmailOutbox.objects.filter(attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS).count()
+    )
+    EMAIL_QUEUE_DEPTH.labels('dead').set(
+        EmailOutbox.objects.filter(attempts__gte=settings.EMAIL_OUTBOX_MAX_ATTEMPTS).count()
+    )
+    # A batch with failures means the broker or SMTP server is having trouble, the rest waits for the next tick.
+    while True:
+        result = dispatch_outbox()
+        if result.failed or result.claimed < settings.EMAIL_OUTBOX_BATCH_SIZE:
+            break
 
+
+def get_pending_outbox():
+    return EmailOutbox.objects.filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()),
+        attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    )
+
+
+def dispatch_outbox(batch_size=None, delivery=None):
+    """
+    Claim a batch of due outbox rows, hand them to Celery or SMTP and delete the delivered ones.
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED so several dispatchers can run in parallel.
+    Returns a DispatchResult with the number of rows claimed and failed.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    delivery = delivery or settings.EMAIL_OUTBOX_DELIVERY
+
+    with transaction.atomic():
+        rows = list(get_pending_outbox().select_for_update(skip_locked=True).order_by('id')[:batch_size])
+        if not rows:
+            return DispatchResult(0, 0)
+
+        if delivery == 'smtp':
+            pending = [row for row in rows if mail.claim(row.idempotency_key)]
+            messages = [mail.build_message(row.subject, row.template, row.context, row.to) for row in pending]
+            failed_messages = mail.send_batch(messages)
+            failed = []
+            for row, message in zip(pending, messages):
+                if message in failed_messages:
+                    mail.release(row.idempotency_key)
+                    failed.append(row)
+        else:
+            failed = []
+            first_exc = None
+            for row in rows:
+                try:
+                    send_mail_task.delay(row.subject, row.template, row.context, row.to,
+                                         idempotency_key=row.idempotency_key)
+                except Exception as exc:
+                    first_exc = first_exc or exc
+                    failed.append(row)
+            if failed:
+                # One line per batch, not per row, when the broker is down.
+                logger.warning('Could not queue %d of %d outbox mails', len(failed), len(rows), exc_info=first_exc,
+                               extra={'failed': len(failed), 'claimed': len(rows)})
+
+        failed_pks = {row.pk for row in failed}
+        EmailOutbox.objects.filter(pk__in=[row.pk for row in rows if row.pk not in failed_pks]).delete()
+        schedule_retries(failed)
+    return DispatchResult(len(rows), len(failed))
+
+
+def schedule_retries(rows):
+    """
+    Count a failed attempt on ``rows`` and push them back by EMAIL_OUTBOX_RETRY_DELAY, doubled per attempt.
+    Rows out of attempts stay in the outbox as dead letters, see ``dispatch_outbox --retry-dead``.
+    """
+    now = timezone.now()
+    for attempts, group in groupby(sorted(rows, key=lambda row: row.attempts), key=lambda row: row.attempts):
+        group = list(group)
+        attempts += 1
+        if attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            for row in group:
+                logger.error('Giving up on %s mail %s to %s after %d attempts', row.template, row.pk, row.to, attempts,
+                             extra={'outbox_id': row.pk, 'template': row.template, 'attempts': attempts})
+            # Dead letters give up their idempotency key, so a new copy of the mail can be queued.
+            EmailOutbox.objects.filter(pk__in=[row.pk for row in group]).update(
+                attempts=attempts, next_attempt_at=None, idempotency_key=None,
+            )
+        else:
+            delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+            EmailOutbox.objects.filter(pk__in=[row.pk for row in group]).update(
+                attempts=attempts, next_attempt_at=now + datetime.timedelta(seconds=delay),
+            )
+
+
+def retry_dead_outbox():
+    """
+    Make the rows that ran out of attempts due again. Returns how many there were.
+    """
+    return EmailOutbox.objects.filter(attempts__gte=settings.EMAIL_OUTBOX_MAX_ATTEMPTS).update(
+        attempts=0, next_attempt_at=None,
+    )
+
+
+@shared_task()
+def purge_expired_activations_task(chunk_size=None):
+    """
+    Delete Activation rows older than BUFFER_TIME in chunks of ``chunk_size`` to keep each delete short.
+    """
+    chunk_size = chunk_size or settings.ACTIVATION_PURGE_CHUNK_SIZE
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.BUFFER_TIME)
+    start = time.perf_counter()
+    purged = 0
+    while True:
+        pks = list(Activation.objects.filter(created_at__lt=cutoff).values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+        purged += Activation.objects.filter(pk__in=pks).delete()[0]
+    elapsed = time.perf_counter() - start
+    logger.info('Purged %d expired activations in %.2fs', purged, elapsed, extra={'purged': purged, 'seconds': elapsed})
+    return {'purged': purged, 'seconds': elapsed}
+
+
+@shared_task()
+def purge_expired_sessions_task(chunk_size=None):
+    """
+    Delete expired rows from django_session in chunks of ``chunk_size``.
+    """
+    chunk_size = chunk_size or settings.SESSION_PURGE_CHUNK_SIZE
+    now = timezone.now()
+    start = time.perf_counter()
+    purged = 0
+    while True:
+        keys = list(Session.objects.filter(expire_date__lt=now).values_list('pk', flat=True)[:chunk_size])
+        if not keys:
+            break
+        purged += Session.objects.filter(pk__in=keys).delete()[0]
+    elapsed = time.perf_counter() - start
+    logger.info('Purged %d expired sessions in %.2fs', purged, elapsed, extra={'purged': purged, 'seconds': elapsed})
+    return {'purged': purged, 'seconds': elapsed}
+
+
+@shared_task()
+def rebuild_email_bloom_task():
+    """
+    Rebuild the registered-email filter from accounts_user and swap it in.
+    """
+    email_filter = bloom.get_filter()
+    if email_filter is None:
+        return None
+    start = time.perf_counter()
+    count = email_filter.rebuild()
+    elapsed = time.perf_counter() - start
+    logger.info('Rebuilt the email filter with %d emails in %.2fs', count, elapsed,
+                extra={'emails': count, 'seconds': elapsed})
+    return {'emails': count, 'seconds': elapsed}
@@ -0,0 +1,518 @@
+# Run with: python manage.py test accounts --settings=core.settings_benchmark
+import email.message
+import json
+import tempfile
+import time
+from unittest import mock
+
+import requests
+from asgiref.sync import sync_to_async
+from django.contrib.admin.sites import site
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth import hashers
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from social_django.models import UserSocialAuth
+from social_django.utils import load_backend, load_strategy
+
+from core.constants import ACCOUNT_ACTIVATION_SUCCESS, ACCOUNT_ALREADY_ACTIVE_EMAIL, ACCOUNT_ALREADY_EXIST_EMAIL, \
+    ACCOUNT_EMAIL_NOT_REGISTERED, ACCOUNT_EMAIL_NOT_VERIFIED
+
+from . import async_views, benchmarks, bloom, tasks, throttling, transport, user_cache
+from .forms import ForgotPasswordForm, LoginForm, RegisterForm, ResendActivationCodeForm
+from .management.commands.import_users import Command as ImportUsersCommand
+from .metrics import ACTIVATIONS
+from .models import EmailOutbox, User
+from .session_backends.cache import SessionStore as CacheSessionStore
+
+PASSWORD = 'Test-pass-123'
+
+
+class AccountTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        bloom._filter = None
+        self.addCleanup(setattr, bloom, '_filter', None)
+
+
+@override_settings(ACCOUNT_EMAIL_BLOOM_BACKEND='')
+class AccountStateQueryTests(AccountTestCase):
+    """
+    Every account-state lookup is one indexed query on lower(email), whatever the table size.
+    """
+
+    def seed(self, count):
+        password = hashers.make_password(PASSWORD)
+        User.objects.bulk_create(
+            [User(email=f'user{i}@example.com', password=password) for i in range(count)]
+            + [User(email=f'pending{i}@example.com', password=password, is_active=False) for i in range(count)],
+            batch_size=1000,
+        )
+
+    def assert_form_queries(self, form_class, email, error):
+        form = form_class({'email': email, 'password': PASSWORD, 'password1': PASSWORD, 'password2': PASSWORD})
+        with self.assertNumQueries(1):
+            form.errors
+        self.assertEqual(form.errors.get('email'), [error] if error else None)
+
+    def check_all(self):
+        with self.assertNumQueries(1):
+            state = User.get_account_state('USER1@example.com')
+        self.assertEqual((state.exists, state.is_active, state.has_usable_password), (True, True, True))
+        with self.assertNumQueries(1):
+            self.assertFalse(User.get_account_state('nobody@example.com').exists)
+
+        self.assert_form_queries(RegisterForm, 'User1@Example.com', ACCOUNT_ALREADY_EXIST_EMAIL)
+        self.assert_form_queries(RegisterForm, 'new@example.com', None)
+        self.assert_form_queries(ResendActivationCodeForm, 'pending1@example.com', None)
+        self.assert_form_queries(ResendActivationCodeForm, 'user1@example.com', ACCOUNT_ALREADY_ACTIVE_EMAIL)
+        self.assert_form_queries(ForgotPasswordForm, 'user1@example.com', None)
+        self.assert_form_queries(ForgotPasswordForm, 'pending1@example.com', ACCOUNT_EMAIL_NOT_VERIFIED)
+        self.assert_form_queries(ForgotPasswordForm, 'nobody@example.com', ACCOUNT_EMAIL_NOT_REGISTERED)
+        self.assert_form_queries(LoginForm, 'pending1@example.com', ACCOUNT_EMAIL_NOT_VERIFIED)
+        self.assert_form_queries(LoginForm, 'nobody@example.com', ACCOUNT_EMAIL_NOT_REGISTERED)
+
+    def test_small_table(self):
+        self.seed(10)
+        self.check_all()
+
+    def test_large_table(self):
+        self.seed(5000)
+        self.check_all()
+
+
+class OutboxDispatchTests(AccountTestCase):
+
+    def queue_mails(self, count):
+        EmailOutbox.objects.bulk_create(
+            [EmailOutbox(to=f'user{i}@example.com', subject='s', template='activate_profile', context={'uri': 'x'})
+             for i in range(count)]
+        )
+
+    @override_settings(EMAIL_OUTBOX_BATCH_SIZE=100, EMAIL_OUTBOX_MAX_ATTEMPTS=5)
+    def test_broker_outage_costs_one_attempt_per_tick(self):
+        self.queue_mails(150)
+        with mock.patch('accounts.tasks.send_mail_task.delay', side_effect=ConnectionError):
+            with self.assertLogs('accounts.tasks', 'WARNING') as logs:
+                tasks.dispatch_outbox_task()
+            self.assertEqual([record.getMessage() for record in logs.records],
+                             ['Could not queue 100 of 100 outbox mails'])
+            self.assertIsInstance(logs.records[0].exc_info[1], ConnectionError)
+            self.assertEqual(EmailOutbox.objects.filter(attempts=1).count(), 100)
+            self.assertEqual(EmailOutbox.objects.filter(attempts=0).count(), 50)
+            # The failed batch is backed off, the next tick only tries the rows not attempted yet.
+            tasks.dispatch_outbox_task()
+        self.assertEqual(list(EmailOutbox.objects.values_list('attempts', flat=True).distinct()), [1])
+        self.assertFalse(EmailOutbox.objects.filter(next_attempt_at__isnull=True).exists())
+
+        EmailOutbox.objects.update(next_attempt_at=None)
+        tasks.dispatch_outbox_task()
+        self.assertFalse(EmailOutbox.objects.exists())
+        self.assertEqual(len(mail.outbox), 150)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_exhausted_rows_are_logged_and_can_be_retried(self):
+        self.queue_mails(1)
+        EmailOutbox.objects.update(idempotency_key='activation:1')
+        with mock.patch('accounts.tasks.send_mail_task.delay', side_effect=ConnectionError):
+            tasks.dispatch_outbox()
+            EmailOutbox.objects.update(next_attempt_at=None)
+            with self.assertLogs('accounts.tasks', 'ERROR') as logs:
+                tasks.dispatch_outbox()
+        self.assertIn('Giving up on activate_profile mail', logs.output[-1])
+        row = EmailOutbox.objects.get()
+        self.assertEqual((row.attempts, row.idempotency_key), (2, None))
+        self.assertEqual(tasks.dispatch_outbox(), (0, 0))
+
+        self.assertEqual(tasks.retry_dead_outbox(), 1)
+        self.assertEqual(tasks.dispatch_outbox(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class FakeRedis:
+    """
+    The list and sorted-set commands the mail queue uses, enough to run it without a Redis server.
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        redis, results = self, []
+
+        class Pipeline:
+            def __getattr__(self, name):
+                return lambda *args: results.append(getattr(redis, name)(*args))
+
+            def execute(self):
+                return results
+        return Pipeline()
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value.encode())
+        return len(self.data[key])
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+    def lmove(self, source, destination, where_from, where_to):
+        if not self.data.get(source):
+            return None
+        value = self.data[source].pop(0 if where_from == 'LEFT' else -1)
+        if not self.data[source]:
+            # Redis deletes a list once it is empty.
+            del self.data[source]
+        self.data.setdefault(destination, []).insert(0 if where_to == 'LEFT' else len(self.data[destination]), value)
+        return value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        self.data.get(key, {}).pop(member, None)
+
+    def zrangebyscore(self, key, low, high):
+        return [member.encode() for member, score in self.data.get(key, {}).items() if score <= high]
+
+    def set(self, *args, **kwargs):
+        return True
+
+
+@override_settings(EMAIL_BATCH_SIZE=2)
+class MailBatchTests(AccountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(tasks.mail, 'get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for i in range(3):
+            tasks.mail.enqueue('s', 'activate_profile', {'uri': 'x'}, f'user{i}@example.com')
+
+    def queued(self):
+        return [json.loads(payload)['to'] for payload in self.redis.data.get(tasks.mail.MAIL_QUEUE_KEY, [])]
+
+    def test_flush_sends_every_batch_and_forgets_it(self):
+        tasks.flush_mail_queue_task()
+        self.assertEqual([message.to[0] for message in mail.outbox],
+                         ['user0@example.com', 'user1@example.com', 'user2@example.com'])
+        self.assertEqual(self.queued(), [])
+        self.assertEqual(self.redis.data[tasks.mail.MAIL_IN_FLIGHT_KEY], {})
+
+    def test_batch_is_requeued_when_the_flush_fails(self):
+        with mock.patch.object(tasks.mail, 'send_batch', side_effect=OSError('SMTP down')):
+            with self.assertRaises(OSError):
+                tasks.flush_mail_queue_task()
+        self.assertEqual(self.queued(), ['user0@example.com', 'user1@example.com', 'user2@example.com'])
+        self.assertEqual(self.redis.data[tasks.mail.MAIL_IN_FLIGHT_KEY], {})
+
+    @override_settings(EMAIL_BATCH_IN_FLIGHT_TIMEOUT=60)
+    def test_batch_of_a_dead_worker_is_recovered(self):
+        batch, payloads = tasks.mail.drain(2)
+        self.assertEqual(len(payloads), 2)
+        self.assertEqual(tasks.mail.recover(), 0)
+        with mock.patch.object(tasks.mail.time, 'time', return_value=time.time() + 61):
+            self.assertEqual(tasks.mail.recover(), 1)
+        self.assertEqual(self.queued(), ['user0@example.com', 'user1@example.com', 'user2@example.com'])
+        self.assertNotIn(batch, self.redis.data)
+
+
+class SkipUnchangedSessionTests(AccountTestCase):
+
+    def test_nested_change_is_saved(self):
+        session = CacheSessionStore()
+        session['cart'] = [1]
+        session.save()
+
+        session = CacheSessionStore(session.session_key)
+        session['cart'].append(2)
+        session.modified = True
+        session.save()
+        self.assertEqual(CacheSessionStore(session.session_key)['cart'], [1, 2])
+
+    def test_unchanged_session_is_not_written(self):
+        session = CacheSessionStore()
+        session['cart'] = [1]
+        session.save()
+
+        session = CacheSessionStore(session.session_key)
+        session['cart'] = [1]
+        with mock.patch('django.contrib.sessions.backends.cache.SessionStore.save') as save:
+            session.save()
+        save.assert_not_called()
+
+
+@override_settings(ACCOUNT_THROTTLE_RATES={'login': '2/m', 'register': '2/m'})
+class ThrottleTests(AccountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        throttling._bucket = None
+        self.addCleanup(setattr, throttling, '_bucket', None)
+
+    def test_form_views_share_the_api_limits(self):
+        for api, view, data in (
+            ('login-api', 'login', {'email': 'nobody@example.com', 'password': PASSWORD}),
+            ('register-api', 'register', {'email': 'new@example.com', 'password1': PASSWORD, 'password2': 'x'}),
+        ):
+            with self.subTest(view=view):
+                self.assertNotEqual(self.client.post(reverse(api), data).status_code, 429)
+                self.assertNotEqual(self.client.post(reverse(view), data).status_code, 429)
+                self.assertEqual(self.client.post(reverse(view), data).status_code, 429)
+
+    @override_settings(ACCOUNT_THROTTLE_TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_client_ip_behind_trusted_proxies(self):
+        for remote_addr, forwarded_for, client_ip in (
+            ('10.0.0.2', '203.0.113.5', '203.0.113.5'),
+            ('10.0.0.2', '198.51.100.1, 203.0.113.5, 10.0.0.9', '203.0.113.5'),
+            ('10.0.0.2', '10.0.0.7, 10.0.0.9', '10.0.0.7'),
+            ('10.0.0.2', '', '10.0.0.2'),
+            ('203.0.113.9', '198.51.100.1', '203.0.113.9'),
+        ):
+            with self.subTest(remote_addr=remote_addr, forwarded_for=forwarded_for):
+                request = RequestFactory().post('/', REMOTE_ADDR=remote_addr, HTTP_X_FORWARDED_FOR=forwarded_for)
+                self.assertEqual(throttling.get_client_ip(request), client_ip)
+
+    @override_settings(ACCOUNT_THROTTLE_TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_clients_behind_a_proxy_get_their_own_bucket(self):
+        data = {'email': 'nobody@example.com', 'password': PASSWORD}
+        for client_ip in ('203.0.113.1', '203.0.113.1', '203.0.113.2'):
+            response = self.client.post(reverse('login-api'), {**data, 'email': f'{client_ip}@example.com'},
+                                        REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR=client_ip)
+            self.assertNotEqual(response.status_code, 429)
+        response = self.client.post(reverse('login-api'), data, REMOTE_ADDR='10.0.0.2',
+                                    HTTP_X_FORWARDED_FOR='203.0.113.1')
+        self.assertEqual(response.status_code, 429)
+
+    def test_redis_bucket_uses_the_server_clock(self):
+        self.assertIn("redis.call('TIME')", throttling.TOKEN_BUCKET_SCRIPT)
+        script = mock.Mock(return_value=b'0')
+        bucket = throttling.RedisTokenBucket()
+        bucket._script = script
+        bucket.consume('key', 5, 1.0)
+        script.assert_called_once_with(keys=['key'], args=[5, 1.0])
+
+
+class ImportUsersTests(AccountTestCase):
+
+    def import_rows(self, *lines):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write('\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines))
+            source.flush()
+            return call_command('import_users', source.name, stdout=mock.Mock())
+
+    def test_counts_only_the_rows_inserted(self):
+        other = User.objects.create_user(email='other@example.com', password=PASSWORD)
+        UserSocialAuth.objects.create(user=other, provider='google-oauth2', uid='taken')
+        bulk_create = User.objects.bulk_create
+
+        def race(users, **kwargs):
+            # Another import creates this email between the existence check and the insert.
+            User.objects.create_user(email='raced@example.com', password=PASSWORD)
+            return bulk_create(users, **kwargs)
+
+        command = ImportUsersCommand()
+        command.stats = {'read': 0, 'created': 0, 'skipped': 0, 'invalid': 0, 'social': 0}
+        with mock.patch.object(User.objects, 'bulk_create', side_effect=race):
+            command.import_batch([
+                {'email': 'new@example.com', 'password': PASSWORD, 'provider': 'google-oauth2', 'uid': 'new'},
+                {'email': 'raced@example.com', 'password': PASSWORD, 'provider': 'google-oauth2', 'uid': 'raced'},
+                {'email': 'linked@example.com', 'password': PASSWORD, 'provider': 'google-oauth2', 'uid': 'taken'},
+            ], None)
+
+        self.assertEqual(command.stats, {'read': 3, 'created': 2, 'skipped': 1, 'invalid': 0, 'social': 1})
+        self.assertFalse(UserSocialAuth.objects.filter(uid='raced').exists())
+
+    def test_rejects_lines_that_are_not_objects(self):
+        with self.assertRaisesMessage(CommandError, 'Line 2 is not a JSON object.'):
+            self.import_rows({'email': 'new@example.com', 'password': PASSWORD}, '["new2@example.com"]')
+
+
+@override_settings(ACCOUNT_QUERY_BUDGETS_STRICT=True)
+class QueryBudgetTests(TransactionTestCase):
+    """
+    Every benchmarked route stays within its view's query_budget, a request going over raises. Not wrapped in
+    a transaction like TestCase, whose savepoints would count against the budgets.
+    """
+
+    def setUp(self):
+        cache.clear()
+        bloom._filter = None
+        self.addCleanup(setattr, bloom, '_filter', None)
+
+    def test_routes_stay_within_their_budgets(self):
+        scenarios = benchmarks.build_scenarios(benchmarks.Fixtures(users=20))
+        for name, prepare in scenarios.items():
+            for result_name, overrides in benchmarks.get_variants(name):
+                with self.subTest(route=result_name), override_settings(**overrides):
+                    for i in range(3):
+                        response = benchmarks.send(*prepare(i))
+                        self.assertLess(response.status_code, 500)
+
+
+class SocialLoginQueryTests(AccountTestCase):
+    """
+    A repeat login through the stub provider, served in-process by transport.LocalAdapter, with unchanged
+    profile data only looks up the social auth row. auth_time still moves on, as it does between real logins.
+    """
+
+    def setUp(self):
+        super().setUp()
+        transport._sessions.clear()
+        self.addCleanup(transport._sessions.clear)
+
+    def login(self):
+        request = RequestFactory().get('/')
+        request.session = {}
+        backend = load_backend(load_strategy(request), 'stub', redirect_uri='/oauth/complete/stub/')
+        return backend.do_auth('stub-alice')
+
+    def test_repeat_login_runs_one_query(self):
+        user = self.login()
+        self.assertEqual(user.email, 'alice@stub.example.com')
+        with mock.patch('social_core.backends.base.time.time', return_value=time.time() + 60), \
+                self.assertNumQueries(1):
+            self.assertEqual(self.login(), user)
+
+
+@override_settings(ACCOUNT_ACTIVATION_MODE='signed')
+class AsyncActivateTests(AccountTestCase):
+
+    async def test_signed_activation_is_counted(self):
+        user = await User.objects.acreate(email='pending@example.com', password='!', is_active=False)
+        code = await sync_to_async(user.get_activation_code)()
+        completed = ACTIVATIONS.labels('completed')._value.get()
+
+        response = await async_views.ActivateApi.as_view()(AsyncRequestFactory().get('/'), code=code)
+
+        self.assertEqual(json.loads(response.content), {'message': ACCOUNT_ACTIVATION_SUCCESS})
+        self.assertEqual(ACTIVATIONS.labels('completed')._value.get(), completed + 1)
+        self.assertTrue((await User.objects.aget(pk=user.pk)).is_active)
+
+
+class MetricsTests(TestCase):
+
+    def test_only_internal_networks_can_scrape(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3').status_code, 200)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7').status_code, 404)
+        with override_settings(METRICS_ALLOWED_NETWORKS=[]):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+class SocialBackendTests(AccountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        transport._sessions.clear()
+        self.addCleanup(transport._sessions.clear)
+
+    def test_sessions_naming_the_stock_backends_stay_logged_in(self):
+        user = User.objects.create_user(email='social@example.com', password=PASSWORD)
+        for path in ('social_core.backends.github.GithubOAuth2', 'django.contrib.auth.backends.ModelBackend'):
+            with self.subTest(backend=path):
+                request = RequestFactory().get('/')
+                request.session = {SESSION_KEY: str(user.pk), BACKEND_SESSION_KEY: path,
+                                   HASH_SESSION_KEY: user.get_session_auth_hash()}
+                self.assertEqual(user_cache.get_user(request), user)
+
+    def test_provider_cookies_are_not_kept(self):
+        session = transport.get_session('github')
+        request = requests.Request('GET', 'https://api.github.com/user').prepare()
+        headers = email.message.Message()
+        headers['Set-Cookie'] = 'logged_in=yes; Path=/; Domain=.github.com'
+        session.cookies.extract_cookies(mock.Mock(info=lambda: headers), requests.cookies.MockRequest(request))
+        self.assertEqual(len(session.cookies), 0)
+
+
+@override_settings(ACCOUNT_USER_CACHE_LOCAL_TTL=60)
+class UserCacheTests(AccountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user_cache._local = None
+        self.addCleanup(setattr, user_cache, '_local', None)
+        self.user = User.objects.create_user(email='cached@example.com', password=PASSWORD)
+
+    def get_user(self):
+        request = RequestFactory().get('/')
+        request.session = {SESSION_KEY: str(self.user.pk), BACKEND_SESSION_KEY: 'accounts.backends.EmailModelBackend',
+                           HASH_SESSION_KEY: self.user.get_session_auth_hash()}
+        return user_cache.get_user(request)
+
+    def test_requests_get_their_own_instance(self):
+        first = self.get_user()
+        first.first_name = 'Changed by one request'
+        with self.assertNumQueries(0):
+            second = self.get_user()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.first_name, '')
+
+    def test_bulk_deactivation_drops_cached_users(self):
+        self.get_user()
+        model_admin = site._registry[User]
+        with mock.patch.object(model_admin, 'message_user'), self.assertNumQueries(1):
+            model_admin.deactivate_users(None, User.objects.filter(pk=self.user.pk))
+        self.assertIsInstance(self.get_user(), AnonymousUser)
+
+
+class EmailFilterTests(AccountTestCase):
+
+    def test_missing_filter_queues_one_rebuild(self):
+        email_filter = bloom.RedisEmailFilter()
+        client = mock.Mock()
+        client.register_script.return_value = mock.Mock(return_value=-1)
+        client.set.side_effect = [True, None]
+        with mock.patch.object(email_filter, 'client', return_value=client), \
+                mock.patch.object(tasks.rebuild_email_bloom_task, 'delay') as delay:
+            self.assertIsNone(email_filter.contains('a@example.com'))
+            self.assertIsNone(email_filter.contains('b@example.com'))
+        delay.assert_called_once_with()
+
+    @override_settings(ACCOUNT_EMAIL_BLOOM_BACKEND='accounts.bloom.MemoryEmailFilter')
+    def test_failed_add_and_reset_fail_open_until_rebuilt(self):
+        email_filter = bloom.get_filter()
+        self.assertFalse(bloom.might_exist('late@example.com'))
+        with mock.patch.object(email_filter, 'add', side_effect=ConnectionError), \
+                mock.patch.object(email_filter, 'reset', side_effect=ConnectionError), \
+                mock.patch.object(email_filter, 'rebuild'), self.assertLogs('accounts.bloom', 'ERROR'):
+            User.objects.create_user(email='late@example.com', password=PASSWORD)
+            self.assertTrue(bloom.might_exist('nobody@example.com'))
+            self.assertTrue(bloom.might_exist('late@example.com'))
+
+        self.assertTrue(bloom.might_exist('late@example.com'))
+        self.assertTrue(bloom.might_exist('late@example.com'))
+        self.assertFalse(bloom.might_exist('nobody@example.com'))
+
+
+class EmailLowerUniqueMigrationTests(TransactionTestCase):
+
+    def setUp(self):
+        call_command('migrate', 'accounts', '0003', verbosity=0)
+        self.addCleanup(call_command, 'migrate', 'accounts', verbosity=0)
+
+    def test_case_duplicates_are_reported_before_the_index_is_built(self):
+        with connection.cursor() as cursor:
+            for email in ('Foo@example.com', 'foo@example.com', 'bar@example.com'):
+                cursor.execute(
+                    "INSERT INTO accounts_user (password, is_superuser, first_name, last_name, email, is_staff, "
+                    "is_active, date_joined) VALUES ('!', FALSE, '', '', %s, FALSE, TRUE, CURRENT_TIMESTAMP)", [email],
+                )
+        with self.assertRaisesMessage(RuntimeError, 'foo@example.com (2 users)'):
+            call_command('migrate', 'accounts', '0004', verbosity=0)
+
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM accounts_user WHERE email = 'Foo@example.com'")
+        call_command('migrate', 'accounts', '0004', verbosity=0)
+        with self.assertRaises(IntegrityError), connection.cursor() as cursor:
+            cursor.execute("UPDATE accounts_user SET email = 'FOO@example.com' WHERE email = 'bar@example.com'")
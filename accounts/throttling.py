@@ -0,0 +1,138 @@
+import functools
+import ipaddress
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# The clock is Redis's own, so web hosts with skewed clocks agree on shared buckets. TIME before a write needs
+# effects replication, the default from Redis 5 on.
+TOKEN_BUCKET_SCRIPT = """
+redis.replicate_commands()
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+def parse_rate(rate):
+    """
+    Parse '10/m' or '10/min' into (capacity, tokens per second).
+    """
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class RedisTokenBucket:
+    """
+    Token buckets kept in the default django_redis cache and updated atomically by a Lua script.
+    """
+
+    def __init__(self):
+        self._script = None
+
+    def consume(self, key, capacity, rate):
+        if self._script is None:
+            from django_redis import get_redis_connection
+            self._script = get_redis_connection('default').register_script(TOKEN_BUCKET_SCRIPT)
+        return float(self._script(keys=[key], args=[capacity, rate]))
+
+
+class MemoryTokenBucket:
+    """
+    Per-process token buckets for tests and single-process deployments.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+_bucket = None
+
+
+def get_bucket():
+    global _bucket
+    if _bucket is None:
+        _bucket = import_string(settings.ACCOUNT_THROTTLE_BACKEND)()
+    return _bucket
+
+
+@functools.lru_cache(maxsize=None)
+def get_trusted_networks(proxies):
+    return [ipaddress.ip_network(proxy.strip(), strict=False) for proxy in proxies if proxy.strip()]
+
+
+def is_trusted(address, networks):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+def get_client_ip(request):
+    """
+    REMOTE_ADDR, or when that is one of ACCOUNT_THROTTLE_TRUSTED_PROXIES, the right-most X-Forwarded-For hop
+    not added by a trusted proxy. Hops further left are set by the client and can be forged.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    networks = get_trusted_networks(tuple(settings.ACCOUNT_THROTTLE_TRUSTED_PROXIES))
+    if not networks or not is_trusted(remote_addr, networks):
+        return remote_addr
+    hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted(hop, networks):
+            return hop
+    return hops[0] if hops else remote_addr
+
+
+def check(request, scope):
+    """
+    Consume a token from the IP and email buckets of ``scope``.
+    Returns 0 when the request may proceed, else the seconds to wait before retrying.
+    """
+    rate = settings.ACCOUNT_THROTTLE_RATES.get(scope)
+    if not rate:
+        return 0
+    capacity, refill = parse_rate(rate)
+    bucket = get_bucket()
+
+    retry_after = bucket.consume(f'accounts:throttle:{scope}:ip:{get_client_ip(request)}', capacity, refill)
+    if retry_after:
+        return math.ceil(retry_after)
+
+    email = request.POST.get('email', '').strip().lower()
+    if email:
+        retry_after = bucket.consume(f'accounts:throttle:{scope}:email:{email}', capacity, refill)
+    return math.ceil(retry_after)
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core import signing
+from django.utils.dateparse import parse_datetime
+
+
+class ActivationTokenGenerator:
+    """
+    Signed, timestamped activation tokens carrying the user id and the last_login fingerprint,
+    so activation needs no Activation row.
+    """
+    salt = 'accounts.tokens.ActivationTokenGenerator'
+
+    def make_token(self, user):
+        last_login = user.last_login.isoformat() if user.last_login else None
+        return signing.dumps([user.pk, last_login], salt=self.salt, compress=False)
+
+    def check_token(self, token):
+        """
+        Return (user_id, last_login) for a valid token younger than BUFFER_TIME, else None.
+        """
+        try:
+            user_id, last_login = signing.loads(token, salt=self.salt, max_age=settings.BUFFER_TIME)
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+        return user_id, parse_datetime(last_login) if last_login else None
+
+
+activation_token_generator = ActivationTokenGenerator()
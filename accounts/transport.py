@@ -0,0 +1,99 @@
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import BaseAdapter, HTTPAdapter
+from social_core.exceptions import AuthFailed
+from social_core.utils import user_agent
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def get_pool_settings(provider):
+    return {**settings.SOCIAL_AUTH_HTTP_POOL['default'], **settings.SOCIAL_AUTH_HTTP_POOL.get(provider, {})}
+
+
+def get_session(provider):
+    """
+    Return the keep-alive requests.Session used for ``provider``'s token and profile calls, created once per
+    process with its own connection pool. SOCIAL_AUTH_HTTP_MOUNTS can route URL prefixes to another adapter.
+    """
+    session = _sessions.get(provider)
+    if session is None:
+        with _lock:
+            session = _sessions.get(provider)
+            if session is None:
+                pool = get_pool_settings(provider)
+                session = requests.Session()
+                # Shared by every user's login: no domain is allowed, so provider cookies are never kept or sent.
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(pool_connections=pool['pool_connections'], pool_maxsize=pool['pool_maxsize'],
+                                      pool_block=pool['pool_block'])
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                for prefix, adapter_class in settings.SOCIAL_AUTH_HTTP_MOUNTS.items():
+                    session.mount(prefix, import_string(adapter_class)())
+                _sessions[provider] = session
+    return session
+
+
+class PooledTransportMixin:
+    """
+    Send a social_core backend's HTTP calls through the provider's pooled session instead of opening a new
+    connection (and TLS handshake) for every call.
+    """
+
+    def request(self, url, method='GET', *args, **kwargs):
+        if self.SSL_PROTOCOL:
+            return super().request(url, method, *args, **kwargs)
+
+        kwargs.setdefault('headers', {})
+        if self.setting('PROXIES') is not None:
+            kwargs.setdefault('proxies', self.setting('PROXIES'))
+        if self.setting('VERIFY_SSL') is not None:
+            kwargs.setdefault('verify', self.setting('VERIFY_SSL'))
+        kwargs.setdefault('timeout', self.setting('REQUESTS_TIMEOUT') or self.setting('URLOPEN_TIMEOUT') or
+                          get_pool_settings(self.name)['timeout'])
+        if self.SEND_USER_AGENT and 'User-Agent' not in kwargs['headers']:
+            kwargs['headers']['User-Agent'] = self.setting('USER_AGENT') or user_agent()
+
+        try:
+            response = get_session(self.name).request(method, url, *args, **kwargs)
+        except requests.ConnectionError as err:
+            raise AuthFailed(self, str(err))
+        response.raise_for_status()
+        return response
+
+
+class LocalAdapter(BaseAdapter):
+    """
+    Serve requests from this Django project in-process, so the stub provider's token and profile endpoints
+    can be called without a running server (see SOCIAL_AUTH_HTTP_MOUNTS in core.settings_benchmark).
+    """
+
+    def send(self, request, **kwargs):
+        from django.test import Client
+
+        url = urlsplit(request.url)
+        headers = {f'HTTP_{name.upper().replace("-", "_")}': value for name, value in request.headers.items()
+                   if name.lower() not in ('content-type', 'content-length')}
+        local = Client().generic(
+            request.method, f'{url.path}?{url.query}' if url.query else url.path, data=request.body or b'',
+            content_type=request.headers.get('Content-Type', ''), SERVER_NAME=url.hostname, **headers,
+        )
+
+        response = requests.Response()
+        response.status_code = local.status_code
+        response.headers.update(local.headers)
+        response._content = local.content
+        response.encoding = local.charset
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
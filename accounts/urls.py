@@ -1,37 +1,36 @@
+from django.conf import settings
 from django.urls import path
 
+from . import async_views, views
 from .views import (
-    RegisterApi,
-    ActivateApi,
-    LoginApi,
-    LogoutApi,
-    ResendActivationCodeApi,
-    PasswordResetApi,
-    RestorePasswordConfirmApi,
-    ForgotPasswordApi,
+    ExportUsersApi,
     LoginView,
     RegisterView,
     LogoutView,
     SocialAuthManageSetting,
     SocialAuthSetPassword,
-    DeactivateAccountApi,
 )
 
+# The JSON APIs are served by their async versions under ASGI (see core.asgi) and by the sync views under WSGI.
+api = async_views if settings.ACCOUNT_ASYNC_VIEWS else views
+
 urlpatterns = [
     # Apis
-    path('register/', RegisterApi.as_view(), name='register-api'),
-    path('login/', LoginApi.as_view(), name='login-api'),
-    path('logout/', LogoutApi.as_view(), name='logout-api'),
+    path('register/', api.RegisterApi.as_view(), name='register-api'),
+    path('login/', api.LoginApi.as_view(), name='login-api'),
+    path('logout/', api.LogoutApi.as_view(), name='logout-api'),
+
+    path('password-reset/', api.PasswordResetApi.as_view(), name='password-reset-api'),
 
-    path('password-reset/', PasswordResetApi.as_view(), name='password-reset-api'),
+    path('forgot-password/', api.ForgotPasswordApi.as_view(), name='forgot-password-api'),
+    path('restore-password/<uidb64>/<token>/', api.RestorePasswordConfirmApi.as_view(), name='restore-password-api'),
 
-    path('forgot-password/', ForgotPasswordApi.as_view(), name='forgot-password-api'),
-    path('restore-password/<uidb64>/<token>/', RestorePasswordConfirmApi.as_view(), name='restore-password-api'),
+    path('activate/<code>/', api.ActivateApi.as_view(), name='activate-api'),
+    path('resent-activation-code/', api.ResendActivationCodeApi.as_view(), name='resend-activation-code-api'),
 
-    path('activate/<code>/', ActivateApi.as_view(), name='activate-api'),
-    path('resent-activation-code/', ResendActivationCodeApi.as_view(), name='resend-activation-code-api'),
+    path('deactivate/', api.DeactivateAccountApi.as_view(), name='deactivate-api'),
 
-    path('deactivate/', DeactivateAccountApi.as_view(), name='deactivate-api'),
+    path('export/users/', ExportUsersApi.as_view(), name='export-users-api'),
 
     # Views
     path('settings/', SocialAuthManageSetting.as_view(), name='settings'),
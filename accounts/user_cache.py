@@ -0,0 +1,184 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model, load_backend
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.crypto import constant_time_compare
+
+from .instrumentation import record_cache
+from .metrics import USER_CACHE_REQUESTS
+
+USER_CACHE_KEY = 'accounts:user:{}'
+# Bumped by invalidate_all(). Entries cached under an older generation are ignored.
+USER_CACHE_GENERATION_KEY = 'accounts:user:generation'
+
+
+class LocalCache:
+    """
+    Small per-process LRU with a TTL, in front of the shared cache.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        if not self.size or self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local = None
+
+
+def get_local_cache():
+    global _local
+    if _local is None:
+        _local = LocalCache(settings.ACCOUNT_USER_CACHE_LOCAL_SIZE, settings.ACCOUNT_USER_CACHE_LOCAL_TTL)
+    return _local
+
+
+def get_cached(user_id, session_hash):
+    """
+    Return ``(user, generation)``: a copy of the cached user for ``user_id`` if it was cached with the same
+    password fingerprint as the session and in the current generation, else None, and the generation to
+    pass to set_cached. An entry from before a password change never matches a session holding the new hash.
+    """
+    key = USER_CACHE_KEY.format(user_id)
+    local = get_local_cache()
+    entry = local.get(key)
+    generation = entry[2] if entry is not None else None
+    result = 'local_hit'
+    if entry is None:
+        entries = cache.get_many([key, USER_CACHE_GENERATION_KEY])
+        entry = entries.get(key)
+        generation = entries.get(USER_CACHE_GENERATION_KEY, 0)
+        result = 'hit'
+        if entry is not None and entry[2] != generation:
+            entry = None
+        if entry is not None:
+            local.set(key, entry)
+    if entry is None or not session_hash or not constant_time_compare(entry[0], session_hash):
+        result = 'miss'
+        entry = None
+    USER_CACHE_REQUESTS.labels(result).inc()
+    record_cache(entry is not None)
+    # Each request gets its own instance, the cached one is shared by every request in this process.
+    return (copy.copy(entry[1]) if entry is not None else None), generation
+
+
+def set_cached(user, generation):
+    entry = (user.get_session_auth_hash(), copy.copy(user), generation)
+    key = USER_CACHE_KEY.format(user.pk)
+    cache.set(key, entry, settings.ACCOUNT_USER_CACHE_TIMEOUT)
+    get_local_cache().set(key, entry)
+
+
+def invalidate(*user_ids):
+    """
+    Drop the cached users now and again after the surrounding transaction commits, so a request reading the
+    old row before the commit cannot put it back.
+    """
+    keys = [USER_CACHE_KEY.format(user_id) for user_id in user_ids]
+    if not keys:
+        return
+
+    def delete():
+        local = get_local_cache()
+        for key in keys:
+            local.delete(key)
+        cache.delete_many(keys)
+
+    delete()
+    transaction.on_commit(delete)
+
+
+def invalidate_all():
+    """
+    Drop every cached user, now and again after the surrounding transaction commits, without listing them:
+    for bulk updates. Other processes drop their local copies within ACCOUNT_USER_CACHE_LOCAL_TTL, as with
+    invalidate().
+    """
+    def bump():
+        get_local_cache().clear()
+        try:
+            cache.incr(USER_CACHE_GENERATION_KEY)
+        except ValueError:
+            cache.add(USER_CACHE_GENERATION_KEY, 1, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_user(request):
+    """
+    django.contrib.auth.get_user, with active users loaded through the cache instead of the database.
+    """
+    try:
+        user_id = get_user_model()._meta.pk.to_python(request.session[SESSION_KEY])
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    backend_path = settings.ACCOUNT_BACKEND_ALIASES.get(backend_path, backend_path)
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    user, generation = get_cached(user_id, session_hash)
+    if user is not None:
+        return user
+
+    user = load_backend(backend_path).get_user(user_id)
+    if user is None:
+        return AnonymousUser()
+
+    session_auth_hash = user.get_session_auth_hash()
+    if not session_hash or not constant_time_compare(session_hash, session_auth_hash):
+        # Sessions signed with a SECRET_KEY_FALLBACKS key are moved to the current key, as Django does.
+        if session_hash and any(
+            constant_time_compare(session_hash, fallback_hash)
+            for fallback_hash in user.get_session_auth_fallback_hash()
+        ):
+            request.session.cycle_key()
+            request.session[HASH_SESSION_KEY] = session_auth_hash
+        else:
+            request.session.flush()
+            return AnonymousUser()
+
+    if user.is_active:
+        set_cached(user, generation)
+    return user
+
+
+def invalidate_user(sender, instance, **kwargs):
+    invalidate(instance.pk)
@@ -1,14 +1,41 @@
-from django.template.loader import render_to_string
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
-from .tasks import send_mail_task
+from .instrumentation import timed
+from .metrics import ACTIVATIONS, PASSWORD_RESETS
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
 
+RESEND_COOLDOWN_KEY = 'accounts:activation-resend:{}'
 
-def send_mail(to, template, context):
-    html_content = render_to_string(f'accounts/emails/{template}.html', context)
-    # send mail using celary
-    send_mail_task.delay(context['subject'], html_content, to)
+
+def send_mail(to, template, context, idempotency_key=None):
+    # The mail is written to the outbox in the caller's transaction, a dispatcher
+    # hands it to the worker which renders it from the template name and context.
+    # A mail with the idempotency key of one still pending in the outbox is dropped.
+    subject = str(context.pop('subject'))
+    start = time.perf_counter()
+    with timed('enqueue'):
+        row = EmailOutbox(to=to, subject=subject, template=template, context=context, idempotency_key=idempotency_key)
+        if idempotency_key is None:
+            row.save()
+        else:
+            EmailOutbox.objects.bulk_create([row], ignore_conflicts=True)
+    logger.info(
+        'Queued %s mail', template,
+        extra={
+            'template': template,
+            'enqueue_ms': (time.perf_counter() - start) * 1000,
+            'payload_bytes': len(json.dumps([subject, template, context, to])),
+        }
+    )
 
 
 def send_activation_email(request, email, code):
@@ -16,7 +43,24 @@ def send_activation_email(request, email, code):
         'subject': _('Profile activation'),
         'uri': request.build_absolute_uri(reverse('activate-api', kwargs={'code': code})),
     }
-    send_mail(email, 'activate_profile', context)
+    send_mail(email, 'activate_profile', context, idempotency_key=f'activation:{code}')
+
+
+def claim_resend(email):
+    """
+    Return True if an activation mail may be resent to ``email``, at most once per
+    ACCOUNT_ACTIVATION_RESEND_COOLDOWN seconds.
+    """
+    if settings.ACCOUNT_ACTIVATION_RESEND_COOLDOWN <= 0:
+        return True
+    if cache.add(RESEND_COOLDOWN_KEY.format(email.lower()), 1, settings.ACCOUNT_ACTIVATION_RESEND_COOLDOWN):
+        return True
+    ACTIVATIONS.labels('coalesced').inc()
+    return False
+
+
+def release_resend(email):
+    cache.delete(RESEND_COOLDOWN_KEY.format(email.lower()))
 
 
 def send_reset_password_email(request, email, token, uid):
@@ -26,3 +70,4 @@ def send_reset_password_email(request, email, token, uid):
             reverse('restore-password-api', kwargs={'uidb64': uid, 'token': token})),
     }
     send_mail(email, 'restore_password_email', context)
+    PASSWORD_RESETS.labels('requested').inc()
@@ -1,26 +1,29 @@
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout
 from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, render, redirect
 from django.utils.decorators import method_decorator
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.views import View
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from social_django.models import UserSocialAuth
 
 from core.constants import ACCOUNT_REGISTER_SUCCESS, ACCOUNT_ACTIVATION_SUCCESS, ACCOUNT_ACTIVATION_FAILED, \
     ACCOUNT_MODEL_BACKEND, ACCOUNT_LOGIN_SUCCESS, ACCOUNT_LOGIN_FAILED, ACCOUNT_LOGOUT_SUCCESS, \
     ACCOUNT_RESENT_ACTIVATION, ACCOUNT_PASSWORD_RESET_SUCCESS, ACCOUNT_PASSWORD_RESET_LINK_SENT, \
     ACCOUNT_PASSWORD_RESET_INVALID_LINK, ACCOUNT_DEACTIVATION_SUCCESS, ACCOUNT_LOGIN_PAGE, ACCOUNT_REGISTER_PAGE, \
-    ACCOUNT_SOCIAL_AUTH_GITHUB, ACCOUNT_SOCIAL_AUTH_TWITTER, ACCOUNT_SOCIAL_AUTH_FACEBOOK, ACCOUNT_SOCIAL_AUTH_GOOGLE, \
-    ACCOUNT_SOCIAL_AUTH_MANAGE_PAGE, ACCOUNT_SOCIAL_AUTH_SET_PASSWORD_PAGE
+    ACCOUNT_SOCIAL_AUTH_MANAGE_PAGE, ACCOUNT_EXPORT_INVALID_FILTER, ACCOUNT_SOCIAL_AUTH_SET_PASSWORD_PAGE
 from .forms import RegisterForm, LoginForm, ResendActivationCodeForm, PasswordResetForm, ForgotPasswordForm, \
     PasswordChangeForm
-from .mixin import LoginRequiredForApiMixin
+from .exports import EXPORT_FORMATS, RENDERERS, get_export_queryset, iter_users, parse_bound
+from .metrics import LOGINS, PASSWORD_RESETS
+from .mixin import LoginRequiredForApiMixin, StaffRequiredForApiMixin, ThrottleMixin
 from .models import Activation, User
-from .utils import send_activation_email, send_reset_password_email
+from .social import get_providers, get_social_connections
+from .utils import claim_resend, release_resend, send_activation_email, send_reset_password_email
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 
@@ -31,7 +34,7 @@ def home(request):
 
 
 # Apis
-class RegisterApi(View):
+class RegisterApi(ThrottleMixin, View):
     """
     description: This is user register API.
     data:
@@ -50,14 +53,18 @@ class RegisterApi(View):
     permission: Must Be Anonymous user
     """
 
+    throttle_scope = 'register'
+    query_budget = 5
+
     def post(self, request, *args, **kwargs):
         form = RegisterForm(request.POST)
         if not form.is_valid():
             return JsonResponse(dict(form.errors.items()))
 
-        user = form.save()
-        code = user.get_activation_code()
-        send_activation_email(request, user.email, code)
+        with transaction.atomic():
+            user = form.save()
+            code = user.get_activation_code()
+            send_activation_email(request, user.email, code)
 
         data = form.cleaned_data
         data['status'] = ACCOUNT_REGISTER_SUCCESS
@@ -75,7 +82,14 @@ class ActivateApi(View):
     :raise: 404 object not found if code is incorrect.
     """
 
+    query_budget = 5
+
     def get(self, request, code=None, *args, **kwargs):
+        if settings.ACCOUNT_ACTIVATION_MODE == 'signed':
+            if not User.activate_with_token(code):
+                return JsonResponse({'message': ACCOUNT_ACTIVATION_FAILED})
+            return JsonResponse({'message': ACCOUNT_ACTIVATION_SUCCESS})
+
         act = get_object_or_404(Activation, code=code)
 
         if not act.is_valid():
@@ -87,7 +101,7 @@ class ActivateApi(View):
         return JsonResponse({'message': ACCOUNT_ACTIVATION_SUCCESS})
 
 
-class LoginApi(View):
+class LoginApi(ThrottleMixin, View):
     """
     description: This is user login API.
     data:
@@ -102,6 +116,9 @@ class LoginApi(View):
     permission: Must Be Anonymous user
     """
 
+    throttle_scope = 'login'
+    query_budget = 7
+
     # Code to automatically set csrf token in postman
     @method_decorator(csrf_exempt)
     def dispatch(self, request, *args, **kwargs):
@@ -111,15 +128,16 @@ class LoginApi(View):
         form = LoginForm(request.POST)
 
         if not form.is_valid():
+            LOGINS.labels('failure').inc()
             return JsonResponse(dict(form.errors.items()))
 
-        email = form.cleaned_data.get('email')
-        password = form.cleaned_data.get('password')
-
-        user = authenticate(email=email, password=password)
+        # The form has already loaded the user and verified the password once.
+        user = form.get_user()
         if user:
             login(request, user, backend=ACCOUNT_MODEL_BACKEND)
+            LOGINS.labels('success').inc()
             return JsonResponse({'message': ACCOUNT_LOGIN_SUCCESS})
+        LOGINS.labels('failure').inc()
         return JsonResponse({'error': ACCOUNT_LOGIN_FAILED})
 
 
@@ -134,12 +152,14 @@ class LogoutApi(LoginRequiredForApiMixin, View):
     permission: Must Be LoggedIn user
     """
 
+    query_budget = 4
+
     def get(self, request, *args, **kwargs):
         logout(request)
         return JsonResponse({'message': ACCOUNT_LOGOUT_SUCCESS})
 
 
-class ResendActivationCodeApi(View):
+class ResendActivationCodeApi(ThrottleMixin, View):
     """
     description: This is API for resending activation email.
     request: requires user object.
@@ -154,15 +174,26 @@ class ResendActivationCodeApi(View):
     permission: Must Be Anonymous user
     """
 
+    throttle_scope = 'resend-activation'
+    query_budget = 6
+
     def post(self, request, *args, **kwargs):
         form = ResendActivationCodeForm(request.POST)
 
         if not form.is_valid():
             return JsonResponse(dict(form.errors.items()))
 
-        user = User.objects.get(email=form.cleaned_data.get('email'))
-        code = user.get_activation_code()
-        send_activation_email(request, user.email, code)
+        # Inside the cooldown the earlier mail is still on its way, the same answer is given without sending.
+        email = form.cleaned_data.get('email')
+        if claim_resend(email):
+            try:
+                user = User.objects.filter_by_email(email).get()
+                with transaction.atomic():
+                    code = user.get_activation_code(reuse=True)
+                    send_activation_email(request, user.email, code)
+            except Exception:
+                release_resend(email)
+                raise
 
         return JsonResponse({'message': ACCOUNT_RESENT_ACTIVATION})
 
@@ -182,6 +213,8 @@ class PasswordResetApi(LoginRequiredForApiMixin, View):
     permission: Must Be LoggedIn user
     """
 
+    query_budget = 5
+
     def post(self, request, *args, **kwargs):
         form = PasswordResetForm(request.POST, user=request.user, reset_password=True)
 
@@ -193,7 +226,7 @@ class PasswordResetApi(LoginRequiredForApiMixin, View):
         return JsonResponse({'message': ACCOUNT_PASSWORD_RESET_SUCCESS})
 
 
-class ForgotPasswordApi(View):
+class ForgotPasswordApi(ThrottleMixin, View):
     """
     description: This is API for forgot password.
     data:
@@ -207,6 +240,9 @@ class ForgotPasswordApi(View):
     permission: Must Be Anonymous user
     """
 
+    throttle_scope = 'forgot-password'
+    query_budget = 3
+
     @method_decorator(csrf_exempt)
     def post(self, request, *args, **kwargs):
         form = ForgotPasswordForm(request.POST)
@@ -214,7 +250,7 @@ class ForgotPasswordApi(View):
         if not form.is_valid():
             return JsonResponse(dict(form.errors.items()))
 
-        user = User.objects.get(email=form.cleaned_data.get('email'))
+        user = User.objects.filter_by_email(form.cleaned_data.get('email')).get()
         token = default_token_generator.make_token(user)
         uid = urlsafe_base64_encode(force_bytes(user.pk))
 
@@ -239,6 +275,8 @@ class RestorePasswordConfirmApi(View):
     permission: Must Be Anonymous user
     """
 
+    query_budget = 2
+
     def post(self, request, uidb64=None, token=None, *args, **kwargs):
         form = PasswordResetForm(request.POST)
 
@@ -251,6 +289,7 @@ class RestorePasswordConfirmApi(View):
             if is_token_valid:
                 form.save(user=user)
                 logout(request)
+                PASSWORD_RESETS.labels('completed').inc()
                 return JsonResponse({'message': ACCOUNT_PASSWORD_RESET_SUCCESS})
             return JsonResponse({'error': ACCOUNT_PASSWORD_RESET_INVALID_LINK})
         except (TypeError, ValueError, OverflowError, User.DoesNotExist):
@@ -268,6 +307,8 @@ class DeactivateAccountApi(LoginRequiredForApiMixin, View):
     permission: Must Be LoggedIn user
     """
 
+    query_budget = 5
+
     def get(self, request):
         user = request.user
         user.is_active = False
@@ -276,8 +317,49 @@ class DeactivateAccountApi(LoginRequiredForApiMixin, View):
         return JsonResponse({'message': ACCOUNT_DEACTIVATION_SUCCESS})
 
 
+class ExportUsersApi(StaffRequiredForApiMixin, View):
+    """
+    description: This is API for streaming users with their social auth providers.
+    request: optional query parameters
+    {
+        format -> csv (default) or jsonl
+        joined_after -> ISO date/datetime, inclusive
+        joined_before -> ISO date/datetime, exclusive
+        is_active -> true or false
+        provider -> social auth provider name, e.g. github
+    }
+    response: CSV or JSON lines stream
+    permission: Must Be Staff user
+    """
+
+    query_budget = 4
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse({'error': ACCOUNT_EXPORT_INVALID_FILTER}, status=400)
+
+        is_active = request.GET.get('is_active')
+        try:
+            queryset = get_export_queryset(
+                joined_after=parse_bound(request.GET.get('joined_after')),
+                joined_before=parse_bound(request.GET.get('joined_before')),
+                is_active=None if is_active is None else is_active.lower() == 'true',
+                provider=request.GET.get('provider'),
+            )
+        except ValueError:
+            return JsonResponse({'error': ACCOUNT_EXPORT_INVALID_FILTER}, status=400)
+
+        response = StreamingHttpResponse(
+            RENDERERS[export_format](iter_users(queryset, chunk_size=settings.ACCOUNT_EXPORT_CHUNK_SIZE)),
+            content_type='text/csv' if export_format == 'csv' else 'application/x-ndjson',
+        )
+        response['Content-Disposition'] = f'attachment; filename="users.{export_format}"'
+        return response
+
+
 # Views
-class LoginView(View):
+class LoginView(ThrottleMixin, View):
     """
     description: This is user login view.
     GET request will display Login Form in login.html page.
@@ -285,6 +367,9 @@ class LoginView(View):
     permission: Must Be Anonymous user
     """
 
+    throttle_scope = 'login'
+    query_budget = 7
+
     def get(self, request):
         form = LoginForm()
         return render(request, template_name=ACCOUNT_LOGIN_PAGE, context={'form': form})
@@ -293,19 +378,18 @@ class LoginView(View):
         form = LoginForm(request.POST)
 
         if form.is_valid():
-            email = form.cleaned_data.get('email')
-            password = form.cleaned_data.get('password')
-
-            user = authenticate(email=email, password=password)
+            user = form.get_user()
             if user:
                 login(request, user, backend=ACCOUNT_MODEL_BACKEND)
+                LOGINS.labels('success').inc()
                 return redirect('home')
 
             messages.error(request, ACCOUNT_LOGIN_FAILED)
+        LOGINS.labels('failure').inc()
         return render(request, template_name=ACCOUNT_LOGIN_PAGE, context={'form': form})
 
 
-class RegisterView(View):
+class RegisterView(ThrottleMixin, View):
     """
     description: This is user register view.
     GET request will display Register Form in register.html page.
@@ -314,6 +398,9 @@ class RegisterView(View):
     permission: Must Be Anonymous user
     """
 
+    throttle_scope = 'register'
+    query_budget = 5
+
     def get(self, request):
         form = RegisterForm()
         return render(request, template_name=ACCOUNT_REGISTER_PAGE, context={'form': form})
@@ -321,9 +408,10 @@ class RegisterView(View):
     def post(self, request):
         form = RegisterForm(request.POST)
         if form.is_valid():
-            user = form.save()
-            code = user.get_activation_code()
-            send_activation_email(request, user.email, code)
+            with transaction.atomic():
+                user = form.save()
+                code = user.get_activation_code()
+                send_activation_email(request, user.email, code)
             return redirect('home')
         return render(request, template_name=ACCOUNT_REGISTER_PAGE, context={'form': form})
 
@@ -335,6 +423,8 @@ class LogoutView(LoginRequiredMixin, View):
     permission: Must Be LoggedIn user
     """
 
+    query_budget = 4
+
     def get(self, request):
         logout(request)
         return redirect('home')
@@ -347,39 +437,23 @@ class SocialAuthManageSetting(LoginRequiredMixin, View):
     permission: Must Be LoggedIn user
     """
 
+    query_budget = 4
+
     def get(self, request):
         user = request.user
+        connections = get_social_connections(user)
+        connected = {provider for provider, uid in connections}
 
-        try:
-            github_login = user.social_auth.get(provider=ACCOUNT_SOCIAL_AUTH_GITHUB)
-        except UserSocialAuth.DoesNotExist:
-            github_login = None
-
-        try:
-            twitter_login = user.social_auth.get(provider=ACCOUNT_SOCIAL_AUTH_TWITTER)
-        except UserSocialAuth.DoesNotExist:
-            twitter_login = None
-
-        try:
-            facebook_login = user.social_auth.get(provider=ACCOUNT_SOCIAL_AUTH_FACEBOOK)
-        except UserSocialAuth.DoesNotExist:
-            facebook_login = None
-
-        try:
-            google_login = user.social_auth.get(provider=ACCOUNT_SOCIAL_AUTH_GOOGLE)
-        except UserSocialAuth.DoesNotExist:
-            google_login = None
-
-        can_disconnect = (user.social_auth.count() > 1 or user.has_usable_password())
+        can_disconnect = (len(connections) > 1 or user.has_usable_password())
 
         return render(
             request,
             template_name=ACCOUNT_SOCIAL_AUTH_MANAGE_PAGE,
             context={
-                'github_login': github_login,
-                'twitter_login': twitter_login,
-                'facebook_login': facebook_login,
-                'google_login': google_login,
+                'providers': [
+                    {'name': name, 'label': label, 'connected': name in connected}
+                    for name, label in get_providers()
+                ],
                 'can_disconnect': can_disconnect
             }
         )
@@ -393,6 +467,8 @@ class SocialAuthSetPassword(LoginRequiredMixin, View):
     permission: Must Be LoggedIn user
     """
 
+    query_budget = 5
+
     def get(self, request):
         form = PasswordChangeForm(user=request.user)
         return render(request, ACCOUNT_SOCIAL_AUTH_SET_PASSWORD_PAGE, {'form': form})
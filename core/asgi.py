@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Serve the async versions of the account APIs, see accounts.urls.
+os.environ.setdefault('ACCOUNT_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,76 @@
+import functools
+import os
+import threading
+
+import psycopg2.extras
+from django.db.backends.postgresql import base
+
+from .pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_stats():
+    """
+    Counters (checkouts, waits, overflow, ...) and current size/idle count per database alias in this process.
+    """
+    return {alias: pool.snapshot() for (alias, pid), pool in list(_pools.items()) if pid == os.getpid()}
+
+
+def configure(connection, isolation_level):
+    if isolation_level is not None:
+        connection.set_session(isolation_level=isolation_level)
+
+
+def connect(conn_params, isolation_level):
+    """
+    Open a connection the way the PostgreSQL backend does. The pool outlives the DatabaseWrapper that
+    created it (there is one per thread), so nothing here may refer to a wrapper.
+    """
+    connection = base.Database.connect(**conn_params)
+    if isolation_level is not None and isolation_level != connection.isolation_level:
+        configure(connection, isolation_level)
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that checks connections out of a per-process pool and returns them on close.
+    Pool options come from the ``POOL`` key of the database settings, keep CONN_MAX_AGE at 0 so every
+    request hands its connection back.
+    """
+
+    def get_pool(self, conn_params):
+        # Keyed by pid as well so a pool created before a fork is never shared with the children.
+        key = (self.alias, os.getpid())
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    options = self.settings_dict.get('POOL', {})
+                    isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+                    pool = _pools[key] = ConnectionPool(
+                        functools.partial(connect, dict(conn_params), isolation_level),
+                        min_size=options.get('MIN_SIZE', 1),
+                        max_size=options.get('MAX_SIZE', 10),
+                        max_overflow=options.get('MAX_OVERFLOW', 5),
+                        timeout=options.get('TIMEOUT', 30),
+                        max_idle=options.get('MAX_IDLE', 300),
+                        check_interval=options.get('CHECK_INTERVAL', 30),
+                        reset_query=options.get('RESET_QUERY', 'DISCARD ALL'),
+                        configure=functools.partial(configure, isolation_level=isolation_level),
+                    )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool(conn_params).getconn()
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                _pools[(self.alias, os.getpid())].putconn(self.connection)
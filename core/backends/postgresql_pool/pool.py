@@ -0,0 +1,161 @@
+import collections
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe DB-API connection pool with overflow, health checks on checkout and idle reaping.
+
+    ``connect`` is a callable returning a new connection. Up to ``max_size`` connections are kept,
+    ``max_overflow`` more can be opened under load and are closed as soon as they are returned.
+    Returned connections are rolled back and cleared with ``reset_query``, then passed to ``configure``
+    (if given) to restore the session settings the reset dropped.
+    Idle connections above ``min_size`` are closed after ``max_idle`` seconds, and a connection idle
+    for more than ``check_interval`` seconds is pinged before it is handed out.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, max_overflow=5, timeout=30, max_idle=300,
+                 check_interval=30, reset_query='DISCARD ALL', configure=None):
+        self._connect = connect
+        self._configure = configure
+        self.reset_query = reset_query
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+
+        self._idle = collections.deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = collections.Counter()
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self.stats['checkouts'] += 1
+        while True:
+            conn, returned_at = self._checkout(deadline)
+            if conn is None:
+                return self._open()
+            if self._is_healthy(conn, returned_at):
+                return conn
+            self.stats['failed_checks'] += 1
+            self._discard(conn)
+
+    def putconn(self, conn):
+        if not self._reset(conn):
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._size > self.max_size:
+                self._size -= 1
+                self.stats['closed'] += 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, size=self._size, idle=len(self._idle))
+
+    def _checkout(self, deadline):
+        with self._cond:
+            waited = False
+            while True:
+                self._reap()
+                if self._idle:
+                    # LIFO: hand out the most recently used connection, the old ones age out.
+                    return self._idle.pop()
+                if self._size < self.max_size + self.max_overflow:
+                    if self._size >= self.max_size:
+                        self.stats['overflow'] += 1
+                    self._size += 1
+                    return None, None
+                if not waited:
+                    self.stats['waits'] += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeout(f'No connection available within {self.timeout}s.')
+                self._cond.wait(remaining)
+
+    def _open(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self.stats['created'] += 1
+        return conn
+
+    def _reap(self):
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self.stats['reaped'] += 1
+            self._close_quietly(conn)
+
+    def _is_healthy(self, conn, returned_at):
+        if getattr(conn, 'closed', False):
+            return False
+        if time.monotonic() - returned_at < self.check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            conn.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _reset(self, conn):
+        if getattr(conn, 'closed', False):
+            return False
+        try:
+            conn.rollback()
+            if self.reset_query:
+                self._execute_reset(conn)
+            if self._configure is not None:
+                self._configure(conn)
+        except Exception:
+            return False
+        return True
+
+    def _execute_reset(self, conn):
+        # DISCARD ALL can't run inside a transaction block. Only DB-API drivers with a settable autocommit
+        # (psycopg2) need switching, others run the query as is.
+        autocommit = getattr(conn, 'autocommit', None)
+        if autocommit is not None:
+            conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute(self.reset_query)
+        cursor.close()
+        if autocommit is not None:
+            conn.autocommit = autocommit
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self.stats['closed'] += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,147 @@
+# Run with: python manage.py test core --settings=core.settings_benchmark
+import threading
+from unittest import mock
+
+from django.db.utils import load_backend
+from django.test import SimpleTestCase
+
+from . import base
+from .pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query):
+        if self.connection.broken:
+            raise OSError('server closed the connection')
+        self.connection.queries.append((query, getattr(self.connection, 'autocommit', None)))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.autocommit = False
+        self.broken = False
+        self.closed = False
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if self.broken:
+            raise OSError('server closed the connection')
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def make_pool(self, **kwargs):
+        return ConnectionPool(FakeConnection, **kwargs)
+
+    def test_returned_connection_is_reset_and_reused(self):
+        pool = self.make_pool(max_size=2)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        self.assertIs(pool.getconn(), connection)
+        self.assertEqual(connection.queries, [('DISCARD ALL', True)])
+        self.assertFalse(connection.autocommit)
+        self.assertEqual(pool.snapshot(), {'checkouts': 2, 'created': 1, 'size': 1, 'idle': 0})
+
+    def test_reset_query_can_be_turned_off(self):
+        pool = self.make_pool(reset_query=None)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        self.assertEqual(connection.queries, [])
+        self.assertIs(pool.getconn(), connection)
+
+    def test_connection_without_autocommit_attribute_is_kept(self):
+        pool = self.make_pool()
+        connection = pool.getconn()
+        del connection.autocommit
+        pool.putconn(connection)
+        self.assertIs(pool.getconn(), connection)
+        self.assertEqual(connection.queries, [('DISCARD ALL', None)])
+
+    def test_overflow_connections_are_closed_on_return(self):
+        pool = self.make_pool(max_size=1, max_overflow=1)
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(second)
+        pool.putconn(first)
+        self.assertTrue(second.closed)
+        self.assertFalse(first.closed)
+        self.assertEqual(pool.snapshot(), {'checkouts': 2, 'created': 2, 'overflow': 1, 'closed': 1, 'size': 1,
+                                           'idle': 1})
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = self.make_pool(max_size=1, max_overflow=0, timeout=0.05)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.snapshot()['timeouts'], 1)
+
+    def test_waiting_checkout_gets_the_returned_connection(self):
+        pool = self.make_pool(max_size=1, max_overflow=0, timeout=5)
+        connection = pool.getconn()
+        threading.Timer(0.05, pool.putconn, [connection]).start()
+        self.assertIs(pool.getconn(), connection)
+        self.assertEqual(pool.snapshot()['waits'], 1)
+
+    def test_failed_reset_discards_the_connection(self):
+        pool = self.make_pool()
+        connection = pool.getconn()
+        connection.broken = True
+        pool.putconn(connection)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.getconn(), connection)
+        self.assertEqual(pool.snapshot()['created'], 2)
+
+    def test_failed_health_check_retries_within_one_checkout(self):
+        pool = self.make_pool(check_interval=0)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        connection.broken = True
+        self.assertIsNot(pool.getconn(), connection)
+        self.assertTrue(connection.closed)
+        stats = pool.snapshot()
+        self.assertEqual((stats['checkouts'], stats['failed_checks'], stats['created']), (2, 1, 2))
+
+
+class PoolPerProcessTests(SimpleTestCase):
+
+    def setUp(self):
+        base._pools.clear()
+        self.addCleanup(base._pools.clear)
+
+    def make_wrapper(self):
+        settings_dict = {
+            'ENGINE': 'core.backends.postgresql_pool', 'NAME': 'test', 'USER': '', 'PASSWORD': '', 'HOST': '',
+            'PORT': '', 'OPTIONS': {}, 'POOL': {'MAX_SIZE': 3}, 'TIME_ZONE': None, 'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': False, 'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False, 'TEST': {},
+        }
+        return load_backend('core.backends.postgresql_pool').DatabaseWrapper(settings_dict, 'default')
+
+    def test_pools_are_shared_by_wrappers_and_keyed_by_process(self):
+        with mock.patch.object(base.os, 'getpid', return_value=100):
+            pool = self.make_wrapper().get_pool({})
+            self.assertIs(self.make_wrapper().get_pool({}), pool)
+            self.assertEqual(pool.max_size, 3)
+        with mock.patch.object(base.os, 'getpid', return_value=101):
+            self.assertIsNot(self.make_wrapper().get_pool({}), pool)
+        self.assertEqual(set(base._pools), {('default', 100), ('default', 101)})
+
+    def test_connections_do_not_refer_to_the_wrapper(self):
+        wrapper = self.make_wrapper()
+        with mock.patch.object(base.base.Database, 'connect', return_value=mock.Mock(isolation_level=None)) as \
+                connect, mock.patch.object(base.psycopg2.extras, 'register_default_jsonb'):
+            wrapper.get_pool({'dbname': 'test'})._connect()
+        connect.assert_called_once_with(dbname='test')
+        self.assertNotIn(wrapper, base._pools[('default', base.os.getpid())]._connect.args)
@@ -0,0 +1,17 @@
+import os
+
+from celery import Celery
+from celery.signals import celeryd_init
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+app = Celery('core')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+
+@celeryd_init.connect
+def select_profile_queues(sender, instance, conf, options, **kwargs):
+    # Concurrency and prefetch of a CELERY_WORKER_PROFILE are plain settings, its queues are selected here.
+    if conf.worker_profile and not options.get('queues'):
+        instance.app.amqp.queues.select(conf.worker_profiles[conf.worker_profile]['queues'])
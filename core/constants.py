@@ -2,7 +2,7 @@
 ACCOUNT_REGISTER_SUCCESS = 'Successfully registered. To activate please verify email.'
 ACCOUNT_ACTIVATION_SUCCESS = 'Successfully account activated.'
 ACCOUNT_ACTIVATION_FAILED = 'Activation code is expired. You can apply for resend code for activation.'
-ACCOUNT_MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+ACCOUNT_MODEL_BACKEND = 'accounts.backends.EmailModelBackend'
 ACCOUNT_LOGIN_SUCCESS = 'Successfully logged in.'
 ACCOUNT_LOGIN_FAILED = 'Invalid credentials.'
 ACCOUNT_LOGOUT_SUCCESS = 'Successfully logged out.'
@@ -11,6 +11,8 @@ ACCOUNT_PASSWORD_RESET_SUCCESS = 'Password reset successful. You must login agai
 ACCOUNT_PASSWORD_RESET_LINK_SENT = 'Link for password reset sent to your email.'
 ACCOUNT_PASSWORD_RESET_INVALID_LINK = 'This link is invalid or expired. You can apply for resend.'
 ACCOUNT_DEACTIVATION_SUCCESS = 'Successfully account deactivated.'
+ACCOUNT_THROTTLED = 'Too many requests. Please try again later.'
+ACCOUNT_EXPORT_INVALID_FILTER = 'Invalid export format or filter.'
 
 # ACCOUNTS TEMPLATE PATH VARIABLE
 ACCOUNT_LOGIN_PAGE = 'accounts/login.html'
@@ -23,6 +25,12 @@ ACCOUNT_SOCIAL_AUTH_GITHUB = 'github'
 ACCOUNT_SOCIAL_AUTH_TWITTER = 'twitter'
 ACCOUNT_SOCIAL_AUTH_FACEBOOK = 'facebook'
 ACCOUNT_SOCIAL_AUTH_GOOGLE = 'google-oauth2'
+ACCOUNT_SOCIAL_AUTH_PROVIDER_LABELS = {
+    ACCOUNT_SOCIAL_AUTH_GITHUB: 'GitHub',
+    ACCOUNT_SOCIAL_AUTH_TWITTER: 'Twitter',
+    ACCOUNT_SOCIAL_AUTH_FACEBOOK: 'Facebook',
+    ACCOUNT_SOCIAL_AUTH_GOOGLE: 'Google',
+}
 
 # ACCOUNTS FORMS VARIABLES
 ACCOUNT_ALREADY_EXIST_EMAIL = 'This email is already registered.'
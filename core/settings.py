@@ -1,6 +1,7 @@
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from kombu import Queue
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,13 +42,14 @@ INSTALLED_APPS = [
     'drf_yasg',
 ]
 MIDDLEWARE = [
+    'accounts.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
 
 
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
@@ -57,9 +59,15 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'core.urls'
 
+# Serve the async account APIs, core.asgi turns this on for ASGI servers.
+ACCOUNT_ASYNC_VIEWS = os.environ.get('ACCOUNT_ASYNC_VIEWS', 'False') == 'True'
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates, with render time reported by RequestTimingMiddleware.
+        'BACKEND': 'accounts.instrumentation.DjangoTemplates',
+        # The alias would otherwise be 'instrumentation', accounts.mail looks the engine up as 'django'.
+        'NAME': 'django',
         'DIRS': ['templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,12 +93,23 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # Set DB_ENGINE=core.backends.postgresql_pool to keep a per-process connection pool (POOL below)
+        # instead of connecting per request.
+        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASS'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'MAX_OVERFLOW': int(os.getenv('DB_POOL_MAX_OVERFLOW', '5')),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            'MAX_IDLE': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+            'CHECK_INTERVAL': float(os.getenv('DB_POOL_CHECK_INTERVAL', '30')),
+            'RESET_QUERY': os.getenv('DB_POOL_RESET_QUERY', 'DISCARD ALL'),
+        },
     }
 }
 
@@ -113,6 +132,39 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# PASSWORD HASHING SETTINGS
+# The preferred hasher is used for new hashes; the others are kept so legacy
+# hashes still verify and get upgraded on the next successful login.
+PASSWORD_HASHER_CHOICES = {
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'pbkdf2_sha256': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'pbkdf2_sha1': 'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CHOICES.items() if name != PASSWORD_HASHER
+]
+
+# Number of worker processes used for hashing, 0 hashes inline in the request worker.
+PASSWORD_HASHING_POOL_SIZE = int(os.environ.get('PASSWORD_HASHING_POOL_SIZE', '0'))
+# Maximum in-flight hashes per pool process before callers have to wait.
+PASSWORD_HASHING_POOL_BACKLOG = int(os.environ.get('PASSWORD_HASHING_POOL_BACKLOG', '4'))
+PASSWORD_HASHING_POOL_START_METHOD = os.environ.get('PASSWORD_HASHING_POOL_START_METHOD', 'spawn')
+
+# SESSION SETTINGS
+# 'db' keeps sessions in django_session, 'cache' keeps them only in Redis and
+# 'cached_db' writes through to both and reads from Redis.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'accounts.session_backends.cache',
+    'cached_db': 'accounts.session_backends.cached_db',
+}[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_PURGE_INTERVAL = float(os.environ.get('SESSION_PURGE_INTERVAL', '3600'))
+SESSION_PURGE_CHUNK_SIZE = int(os.environ.get('SESSION_PURGE_CHUNK_SIZE', '1000'))
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
@@ -140,17 +192,57 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'accounts.User'
 
 AUTHENTICATION_BACKENDS = (
-    'social_core.backends.github.GithubOAuth2',
-    'social_core.backends.twitter.TwitterOAuth',
-    'social_core.backends.facebook.FacebookOAuth2',
-    'social_core.backends.google.GoogleOAuth2',
-    'social_core.backends.instagram.InstagramOAuth2',
-
-    'django.contrib.auth.backends.ModelBackend',
+    # social_core backends sending their HTTP calls through pooled keep-alive sessions.
+    'accounts.social_backends.GithubOAuth2',
+    'accounts.social_backends.TwitterOAuth',
+    'accounts.social_backends.FacebookOAuth2',
+    'accounts.social_backends.GoogleOAuth2',
+    'accounts.social_backends.InstagramOAuth2',
+
+    'accounts.backends.EmailModelBackend',
 )
 
+# Sessions from before the backends above replaced the stock ones still name the old paths. They are read as
+# the replacement instead of being logged out, see accounts.user_cache.get_user.
+ACCOUNT_BACKEND_ALIASES = {
+    'social_core.backends.github.GithubOAuth2': 'accounts.social_backends.GithubOAuth2',
+    'social_core.backends.twitter.TwitterOAuth': 'accounts.social_backends.TwitterOAuth',
+    'social_core.backends.facebook.FacebookOAuth2': 'accounts.social_backends.FacebookOAuth2',
+    'social_core.backends.google.GoogleOAuth2': 'accounts.social_backends.GoogleOAuth2',
+    'social_core.backends.instagram.InstagramOAuth2': 'accounts.social_backends.InstagramOAuth2',
+    'django.contrib.auth.backends.ModelBackend': 'accounts.backends.EmailModelBackend',
+}
+
+# Local OAuth2 stub provider served at /oauth-stub/, for offline benchmarks and tests.
+SOCIAL_AUTH_STUB_ENABLED = os.environ.get('SOCIAL_AUTH_STUB_ENABLED', 'False') == 'True'
+SOCIAL_AUTH_STUB_BASE_URL = os.environ.get('SOCIAL_AUTH_STUB_BASE_URL', 'http://127.0.0.1:8000/oauth-stub/')
+SOCIAL_AUTH_STUB_LATENCY = float(os.environ.get('SOCIAL_AUTH_STUB_LATENCY', '0'))
+SOCIAL_AUTH_STUB_KEY = 'stub-key'
+SOCIAL_AUTH_STUB_SECRET = 'stub-secret'
+if SOCIAL_AUTH_STUB_ENABLED:
+    AUTHENTICATION_BACKENDS += ('accounts.social_backends.StubOAuth2',)
+
 PASSWORD_RESET_TIMEOUT = int(os.environ.get('PASSWORD_RESET_TIMEOUT', '3600'))
 
+# Seconds an activation code stays valid.
+BUFFER_TIME = int(os.environ.get('BUFFER_TIME', '3600'))
+# 'db' stores activation codes in the Activation table, 'signed' issues stateless signed tokens.
+ACCOUNT_ACTIVATION_MODE = os.environ.get('ACCOUNT_ACTIVATION_MODE', 'db')
+ACTIVATION_PURGE_INTERVAL = float(os.environ.get('ACTIVATION_PURGE_INTERVAL', '3600'))
+ACTIVATION_PURGE_CHUNK_SIZE = int(os.environ.get('ACTIVATION_PURGE_CHUNK_SIZE', '1000'))
+# A resend reuses a code issued less than this many seconds ago, so it still has at least
+# BUFFER_TIME - ACCOUNT_ACTIVATION_REUSE_WINDOW left. 0 always issues a new code.
+ACCOUNT_ACTIVATION_REUSE_WINDOW = int(os.environ.get('ACCOUNT_ACTIVATION_REUSE_WINDOW', str(BUFFER_TIME // 2)))
+# Resend requests for the same email within this many seconds are answered without sending. 0 disables it.
+ACCOUNT_ACTIVATION_RESEND_COOLDOWN = int(os.environ.get('ACCOUNT_ACTIVATION_RESEND_COOLDOWN', '60'))
+
+# Bloom filter of registered emails, so login, resend and forgot-password reject unknown emails without a
+# query. Empty disables it. The periodic rebuild also forgets deleted users.
+ACCOUNT_EMAIL_BLOOM_BACKEND = os.environ.get('ACCOUNT_EMAIL_BLOOM_BACKEND', 'accounts.bloom.RedisEmailFilter')
+ACCOUNT_EMAIL_BLOOM_CAPACITY = int(os.environ.get('ACCOUNT_EMAIL_BLOOM_CAPACITY', '1000000'))
+ACCOUNT_EMAIL_BLOOM_ERROR_RATE = float(os.environ.get('ACCOUNT_EMAIL_BLOOM_ERROR_RATE', '0.001'))
+ACCOUNT_EMAIL_BLOOM_REBUILD_INTERVAL = float(os.environ.get('ACCOUNT_EMAIL_BLOOM_REBUILD_INTERVAL', '86400'))
+
 LOGIN_URL = 'login'
 LOGOUT_URL = 'logout'
 LOGIN_REDIRECT_URL = 'home'
@@ -167,10 +259,37 @@ SOCIAL_AUTH_PIPELINE = (
     'social_core.pipeline.user.get_username',
     'social_core.pipeline.user.create_user',
     'social_core.pipeline.social_auth.associate_user',
-    'social_core.pipeline.social_auth.load_extra_data',
-    'social_core.pipeline.user.user_details',
+    'accounts.pipeline.invalidate_social_connections_cache',
+    # Drop-in versions of load_extra_data and user_details that skip unchanged writes.
+    'accounts.pipeline.load_extra_data',
+    'accounts.pipeline.user_details',
+    'accounts.pipeline.record_social_auth',
+)
+
+SOCIAL_AUTH_DISCONNECT_PIPELINE = (
+    'social_core.pipeline.disconnect.allowed_to_disconnect',
+    'social_core.pipeline.disconnect.get_entries',
+    'social_core.pipeline.disconnect.revoke_tokens',
+    'social_core.pipeline.disconnect.disconnect',
+    'accounts.pipeline.invalidate_social_connections_cache',
 )
 
+# Seconds a user's social connections stay cached for the settings page.
+SOCIAL_CONNECTIONS_CACHE_TIMEOUT = int(os.environ.get('SOCIAL_CONNECTIONS_CACHE_TIMEOUT', '3600'))
+
+# Connection pools and timeouts (connect, read) for provider HTTP calls, per backend name over 'default'.
+# SOCIAL_AUTH_<NAME>_REQUESTS_TIMEOUT still takes precedence over the timeout here.
+SOCIAL_AUTH_HTTP_POOL = {
+    'default': {
+        'pool_connections': 4,
+        'pool_maxsize': int(os.environ.get('SOCIAL_AUTH_HTTP_POOL_MAXSIZE', '10')),
+        'pool_block': False,
+        'timeout': (3.05, float(os.environ.get('SOCIAL_AUTH_HTTP_READ_TIMEOUT', '10'))),
+    },
+}
+# URL prefix -> requests adapter class, mounted on every provider session.
+SOCIAL_AUTH_HTTP_MOUNTS = {}
+
 SOCIAL_AUTH_GITHUB_KEY = os.environ.get('GITHUB_CLIENT_ID')
 SOCIAL_AUTH_GITHUB_SECRET = os.environ.get('GITHUB_CLIENT_SECRET')
 
@@ -192,11 +311,32 @@ SOCIAL_AUTH_FACEBOOK_PROFILE_EXTRA_PARAMS = {
 
 
 # EMAIL SETTINGS
-EMAIL_USE_TLS = True
-EMAIL_HOST = 'smtp.gmail.com'
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
-EMAIL_PORT = 587
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '587'))
+
+# Mails are collected for EMAIL_BATCH_WINDOW seconds or until EMAIL_BATCH_SIZE
+# are queued, then sent over one SMTP connection. 1 disables batching.
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', '1'))
+EMAIL_BATCH_WINDOW = int(os.environ.get('EMAIL_BATCH_WINDOW', '2'))
+# A batch still in flight after this many seconds belongs to a worker that died, the next flush requeues it.
+EMAIL_BATCH_IN_FLIGHT_TIMEOUT = int(os.environ.get('EMAIL_BATCH_IN_FLIGHT_TIMEOUT', '300'))
+EMAIL_SEND_MAX_RETRIES = int(os.environ.get('EMAIL_SEND_MAX_RETRIES', '3'))
+EMAIL_SEND_RETRY_DELAY = int(os.environ.get('EMAIL_SEND_RETRY_DELAY', '30'))
+# send_mail_task drops a mail whose idempotency key was already sent within this many seconds.
+EMAIL_IDEMPOTENCY_WINDOW = int(os.environ.get('EMAIL_IDEMPOTENCY_WINDOW', '60'))
+
+# Outbox dispatch: 'celery' queues send_mail_task per row, 'smtp' sends the batch directly.
+EMAIL_OUTBOX_DELIVERY = os.environ.get('EMAIL_OUTBOX_DELIVERY', 'celery')
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', '100'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+# Seconds before a failed row is retried, doubled on every further attempt.
+EMAIL_OUTBOX_RETRY_DELAY = int(os.environ.get('EMAIL_OUTBOX_RETRY_DELAY', '30'))
+EMAIL_OUTBOX_DISPATCH_INTERVAL = float(os.environ.get('EMAIL_OUTBOX_DISPATCH_INTERVAL', '5'))
+# Recipients per send_reminder_batch_task, also the chunk size they are read from the database in.
+EMAIL_BULK_CHUNK_SIZE = int(os.environ.get('EMAIL_BULK_CHUNK_SIZE', '500'))
 
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
@@ -213,6 +353,62 @@ CELERY_RESULT_BACKEND = 'django-db'
 
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# Activation and reset mails go to their own queue so a reminder campaign on the bulk queue never delays them.
+# On Redis each queue is split into priority lists and 0 is served first.
+CELERY_TASK_QUEUES = tuple(Queue(name, routing_key=name) for name in ('mail.transactional', 'mail.bulk', 'celery'))
+CELERY_TASK_ROUTES = {
+    'accounts.tasks.send_mail_task': {'queue': 'mail.transactional', 'priority': 0},
+    'accounts.tasks.deliver_mail_task': {'queue': 'mail.transactional', 'priority': 0},
+    'accounts.tasks.flush_mail_queue_task': {'queue': 'mail.transactional', 'priority': 0},
+    'accounts.tasks.dispatch_outbox_task': {'queue': 'mail.transactional', 'priority': 0},
+    'accounts.tasks.send_reminders_task': {'queue': 'mail.bulk', 'priority': 9},
+    'accounts.tasks.send_reminder_batch_task': {'queue': 'mail.bulk', 'priority': 9},
+}
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': list(range(10)),
+    'sep': ':',
+}
+
+# Start one worker per profile, e.g. CELERY_WORKER_PROFILE=bulk celery -A core worker. A worker without a
+# profile consumes every queue. -Q, -c and --prefetch-multiplier on the command line still win.
+CELERY_WORKER_PROFILES = {
+    # One reserved message per process, so urgent mail never waits behind a slow SMTP send in another process.
+    'transactional': {
+        'queues': ['mail.transactional'],
+        'concurrency': int(os.environ.get('CELERY_TRANSACTIONAL_CONCURRENCY', '4')),
+        'prefetch_multiplier': 1,
+    },
+    'bulk': {
+        'queues': ['mail.bulk', 'celery'],
+        'concurrency': int(os.environ.get('CELERY_BULK_CONCURRENCY', '2')),
+        'prefetch_multiplier': int(os.environ.get('CELERY_BULK_PREFETCH_MULTIPLIER', '4')),
+    },
+}
+CELERY_WORKER_PROFILE = os.environ.get('CELERY_WORKER_PROFILE')
+if CELERY_WORKER_PROFILE:
+    CELERY_WORKER_CONCURRENCY = CELERY_WORKER_PROFILES[CELERY_WORKER_PROFILE]['concurrency']
+    CELERY_WORKER_PREFETCH_MULTIPLIER = CELERY_WORKER_PROFILES[CELERY_WORKER_PROFILE]['prefetch_multiplier']
+
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-email-outbox': {
+        'task': 'accounts.tasks.dispatch_outbox_task',
+        'schedule': EMAIL_OUTBOX_DISPATCH_INTERVAL,
+    },
+    'purge-expired-activations': {
+        'task': 'accounts.tasks.purge_expired_activations_task',
+        'schedule': ACTIVATION_PURGE_INTERVAL,
+    },
+    'purge-expired-sessions': {
+        'task': 'accounts.tasks.purge_expired_sessions_task',
+        'schedule': SESSION_PURGE_INTERVAL,
+    },
+    'rebuild-email-bloom': {
+        'task': 'accounts.tasks.rebuild_email_bloom_task',
+        'schedule': ACCOUNT_EMAIL_BLOOM_REBUILD_INTERVAL,
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
@@ -230,9 +426,53 @@ CACHES = {
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
         }
-    }
+    },
+    # Eviction is per Redis instance, not per database. With SESSION_BACKEND=cache point SESSION_REDIS_URL at a
+    # separate instance running maxmemory-policy noeviction, or memory pressure on the cache logs users out.
+    'sessions': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('SESSION_REDIS_URL', 'redis://redis:6379/1'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        }
+    },
 }
 
+# Users read per server-side cursor fetch by the user export.
+ACCOUNT_EXPORT_CHUNK_SIZE = int(os.environ.get('ACCOUNT_EXPORT_CHUNK_SIZE', '2000'))
+
+# Admin changelists show the pg_class row estimate instead of COUNT(*) above this many rows.
+ACCOUNT_ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.environ.get('ACCOUNT_ADMIN_ESTIMATED_COUNT_THRESHOLD', '100000'))
+
+# THROTTLING SETTINGS
+# Token bucket rates per endpoint, applied separately per client IP and per email.
+ACCOUNT_THROTTLE_BACKEND = os.environ.get('ACCOUNT_THROTTLE_BACKEND', 'accounts.throttling.RedisTokenBucket')
+# Proxies in front of the app (comma separated addresses or networks, e.g. the load balancer subnet). Requests
+# from them are throttled on the client address they append to X-Forwarded-For instead of their own.
+ACCOUNT_THROTTLE_TRUSTED_PROXIES = [
+    proxy for proxy in os.environ.get('ACCOUNT_THROTTLE_TRUSTED_PROXIES', '').split(',') if proxy.strip()
+]
+ACCOUNT_THROTTLE_RATES = {
+    'login': '10/m',
+    'register': '5/m',
+    'forgot-password': '5/m',
+    'resend-activation': '3/m',
+}
+
+# request.user is cached by id in the default cache, behind a short-lived per-process LRU (0 TTL disables it).
+ACCOUNT_USER_CACHE_TIMEOUT = int(os.environ.get('ACCOUNT_USER_CACHE_TIMEOUT', '300'))
+ACCOUNT_USER_CACHE_LOCAL_TTL = float(os.environ.get('ACCOUNT_USER_CACHE_LOCAL_TTL', '2'))
+ACCOUNT_USER_CACHE_LOCAL_SIZE = int(os.environ.get('ACCOUNT_USER_CACHE_LOCAL_SIZE', '1024'))
+
+# Views declare a query_budget, RequestTimingMiddleware logs a warning when a request runs more queries
+# or raises QueryBudgetExceeded when strict (benchmarks and tests).
+ACCOUNT_QUERY_BUDGETS_STRICT = os.environ.get('ACCOUNT_QUERY_BUDGETS_STRICT', 'False') == 'True'
+
+# /metrics only answers scrapers from these networks (comma separated), everyone else gets a 404.
+METRICS_ALLOWED_NETWORKS = os.environ.get(
+    'METRICS_ALLOWED_NETWORKS', '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16',
+).split(',')
+
 INTERNAL_IPS = [
     "127.0.0.1","0.0.0.0"
 ]
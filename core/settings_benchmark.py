@@ -0,0 +1,42 @@
+# Settings for running the endpoint benchmarks offline:
+#   DJANGO_SETTINGS_MODULE=core.settings_benchmark python manage.py benchmark_endpoints
+# SQLite by default, set BENCHMARK_DB=postgres to use the DB_* database from core.settings.
+import os
+
+# The stub OAuth provider is served in-process, see SOCIAL_AUTH_HTTP_MOUNTS below.
+os.environ.setdefault('SOCIAL_AUTH_STUB_ENABLED', 'True')
+os.environ.setdefault('SOCIAL_AUTH_STUB_BASE_URL', 'http://testserver/oauth-stub/')
+
+from .settings import *  # noqa: E402,F401,F403
+
+SECRET_KEY = os.environ.get('SECRET_KEY') or 'benchmark-secret-key'
+DEBUG = False
+
+if os.environ.get('BENCHMARK_DB', 'sqlite') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            # The harness runs against a throwaway test database, nothing is written to disk.
+            'NAME': ':memory:',
+        }
+    }
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'},
+}
+
+# No SMTP server or broker: mails stay in memory and tasks run eagerly.
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+EMAIL_BATCH_SIZE = 1
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+
+ACCOUNT_THROTTLE_BACKEND = 'accounts.throttling.MemoryTokenBucket'
+ACCOUNT_THROTTLE_RATES = {}
+ACCOUNT_EMAIL_BLOOM_BACKEND = 'accounts.bloom.MemoryEmailFilter'
+
+# A view going over its query_budget fails the run.
+ACCOUNT_QUERY_BUDGETS_STRICT = True
+
+SOCIAL_AUTH_HTTP_MOUNTS = {SOCIAL_AUTH_STUB_BASE_URL: 'accounts.transport.LocalAdapter'}  # noqa: F405
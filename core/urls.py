@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
+from accounts.metrics import metrics
 from accounts.views import home as account_home
 
 urlpatterns = [
@@ -7,5 +9,8 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('oauth/', include('social_django.urls', namespace='social')),
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
 ]
 
+if settings.SOCIAL_AUTH_STUB_ENABLED:
+    urlpatterns.append(path('oauth-stub/', include('accounts.stub_provider')))